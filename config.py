@@ -3,3 +3,4 @@ DAYS_BETWEEN_MATCHES = 6
 BASE_PLAYER_HEALTH = 85
 BASE_PLAYER_MOTIVATION = 70
 BOT_RATING_STEP = 250
+REQUEST_LOG_DB_NAME = None  # for example 'requests.db' to additionally store the server's request log in SQLite
@@ -12,6 +12,7 @@ from data.esports_player import ESportsPlayer
 from data.game_event import ComposedEvent, MoneyChange, SkillChange, HealthChange, MotivationChange, HiddenSkillChange, EventAffectingOtherPlayer
 from data.game_event_base import GameEvent
 from data.manager_choice import ManagerChoice
+from data.opponent_pool import OpponentPool
 from data.replace_player import ReplacePlayerWithNewlyGeneratedPlayer
 from data.unknown_outcome import UnknownOutcome
 from lib.util import EBCP
@@ -134,48 +135,36 @@ class PlayRankedMatchesSampler(ActionSampler):
         ts = CustomTrueSkill()
         num_games = random.randint(3, 10)
         rating_before = player.ranked_elo
-        performance_tracker = player.model_copy()  # measures performance from played games only
-        performance_tracker.ranked_elo_sigma = ts.sigma
+        # measures performance from played games only
+        performance_mu, performance_sigma = player.ranked_elo, ts.sigma
         player_placements = []
         opponent_ratings = []
-        for _ in range(num_games):
-            random_opponents = [ESportsPlayer.create() for _ in range(NUM_BOTS_IN_TOURNAMENT)]
-            for o in random_opponents:
-                o.hidden_elo -= 90  # those randoms are simply not as good as us professionals
-                if o.hidden_elo > player.ranked_elo:
-                    o.hidden_elo = player.ranked_elo + random.normalvariate(0, 100)  # unless the professionals are also bad, then we pair them against bad players
-                o.hidden_elo += random.normalvariate(sigma=100)  # there is some extra skill fluctuation
-                o.ranked_elo = o.hidden_skill()
-                o.ranked_elo_sigma /= 10
-                opponent_ratings.append(o.ranked_elo)
-
-            match_players = [player] + random_opponents
-
-            ts = CustomTrueSkill()
-            visible_ratings = [(ts.create_rating(mu=player.ranked_elo, sigma=player.ranked_elo_sigma),) for player in match_players]
-            true_ratings = [(ts.create_rating(mu=player.hidden_skill()),) for player in match_players]
-            ranks = ts.sample_ranks(true_ratings)
-            assert len(visible_ratings) == len(match_players) == len(ranks)
-            new_ratings = ts.rate(visible_ratings, ranks)
-            assert len(new_ratings) == len(match_players)
-            for new_ratings, p in zip(new_ratings, match_players):
-                assert len(new_ratings) == 1
-                p.ranked_elo = new_ratings[0].mu
-                p.ranked_elo_sigma = new_ratings[0].sigma
-
-            visible_ratings_recent_matches = [(ts.create_rating(mu=player.ranked_elo, sigma=player.ranked_elo_sigma),) for player in [performance_tracker] + random_opponents]
-            new_ratings = ts.rate(visible_ratings_recent_matches, ranks)
-            performance_tracker.ranked_elo = new_ratings[0][0].mu
-            performance_tracker.ranked_elo_sigma = new_ratings[0][0].sigma
-
-            player_placements.append(ranks[0] + 1)
+        opponent_pool = OpponentPool.create(num_games)
+        for game_idx in range(num_games):
+            # the opponents depend on the rating after the previous game
+            opponents = opponent_pool.match(game_idx).public_players(player.ranked_elo)
+            opponent_skills = opponents.hidden_skills()[0]
+            opponent_ratings.extend(opponent_skills.tolist())
+            ranks = opponents.sample_ranks(ts, player.hidden_skill())[0]
+
+            mus = numpy.concatenate([[player.ranked_elo], opponent_skills])
+            sigmas = numpy.concatenate([[player.ranked_elo_sigma], numpy.full(len(opponent_skills), ESportsPlayer.starting_sigma() / 10)])
+            mus, sigmas = ts.rate_arrays(mus, sigmas, ranks)
+            player.ranked_elo = float(mus[0])
+            player.ranked_elo_sigma = float(sigmas[0])
+
+            mus[0], sigmas[0] = performance_mu, performance_sigma
+            mus, sigmas = ts.rate_arrays(mus, sigmas, ranks)
+            performance_mu, performance_sigma = float(mus[0]), float(sigmas[0])
+
+            player_placements.append(int(ranks[0]) + 1)
 
         return [
             ComposedEvent(
                 description=f'Ranked matches summary:\n\n'
                             f'{num_games} matches played\n'
                             f'{numpy.mean(player_placements):.1f} average placement\n'
-                            f'{performance_tracker.ranked_elo:.0f} performance in those games\n'
+                            f'{performance_mu:.0f} performance in those games\n'
                             f'{numpy.mean(opponent_ratings):.0f} average opponent rating'
                             f'-> {player.ranked_elo:.0f} skill rating ({player.ranked_elo - rating_before:+.0f})',
                 events=[]
@@ -188,21 +177,10 @@ class PlayUnrankedMatchesSampler(ActionSampler):
 
     def possible_events(self, game: ESportsGame, player: ESportsPlayer) -> List[GameEvent]:
         num_games = random.randint(3, 10)
-        player_placements = []
-        for _ in range(num_games):
-            random_opponents = [ESportsPlayer.create() for _ in range(NUM_BOTS_IN_TOURNAMENT)]
-            for o in random_opponents:
-                o.hidden_elo -= 90  # those randoms are simply not as good as us professionals
-                if o.hidden_elo > player.ranked_elo:
-                    o.hidden_elo = player.ranked_elo + random.normalvariate(0, 100)  # unless the professionals are also bad, then we pair them against bad players
-                o.hidden_elo += random.normalvariate(sigma=100)  # there is some extra skill fluctuation
-
-            match_players = [player] + random_opponents
-
-            ts = CustomTrueSkill()
-            true_ratings = [(ts.create_rating(mu=player.hidden_skill()),) for player in match_players]
-            ranks = ts.sample_ranks(true_ratings)
-            player_placements.append(ranks[0] + 1)
+        ts = CustomTrueSkill()
+        # no ratings change in unranked matches, so all of them can be sampled at once
+        opponents = OpponentPool.create(num_games).public_players(player.ranked_elo)
+        player_placements = (opponents.sample_ranks(ts, player.hidden_skill())[:, 0] + 1).tolist()
 
         avg_placement = numpy.mean(player_placements)
         avg_placement_percentile = (avg_placement - 1) / (NUM_BOTS_IN_TOURNAMENT + 1 - 1)
@@ -237,37 +215,24 @@ class PlayBotMatchesSampler(ActionSampler):
         ts = CustomTrueSkill()
         num_games = random.randint(5, 15)
         rating_before = player.bot_match_elo
-        performance_tracker = player.model_copy()  # measures performance from played games only
-        performance_tracker.bot_match_elo_sigma = ts.sigma
-        player_placements = []
+        # measures performance from played games only
+        performance_mu, performance_sigma = player.bot_match_elo, ts.sigma
         bot_elo = round(player.bot_match_elo / BOT_RATING_STEP + random.normalvariate(sigma=1)) * BOT_RATING_STEP
-        for _ in range(num_games):
-            random_opponents = [ESportsPlayer.create() for _ in range(NUM_BOTS_IN_TOURNAMENT - 1)]
-            for o in random_opponents:
-                o.hidden_elo = bot_elo
-                o.bot_match_elo = o.hidden_skill()
-                o.bot_match_elo_sigma /= 10
-
-            match_players = [player] + random_opponents
-
-            ts = CustomTrueSkill()
-            visible_ratings = [(ts.create_rating(mu=player.bot_match_elo, sigma=player.bot_match_elo_sigma),) for player in match_players]
-            true_ratings = [(ts.create_rating(mu=player.hidden_skill()),) for player in match_players]
-            ranks = ts.sample_ranks(true_ratings)
-            assert len(visible_ratings) == len(match_players) == len(ranks)
-            new_ratings = ts.rate(visible_ratings, ranks)
-            assert len(new_ratings) == len(match_players)
-            for new_rating, p in zip(new_ratings, match_players):
-                assert len(new_rating) == 1
-                p.bot_match_elo = new_rating[0].mu
-                p.bot_match_elo_sigma = new_rating[0].sigma
-
-            visible_ratings_recent_matches = [(ts.create_rating(mu=player.bot_match_elo, sigma=player.bot_match_elo_sigma),) for player in [performance_tracker] + random_opponents]
-            new_ratings = ts.rate(visible_ratings_recent_matches, ranks)
-            performance_tracker.bot_match_elo = new_ratings[0][0].mu
-            performance_tracker.bot_match_elo_sigma = new_ratings[0][0].sigma
-
-            player_placements.append(ranks[0] + 1)
+        # the bots do not depend on the player's rating, so all games can be sampled at once
+        opponents = OpponentPool.create(num_games, NUM_BOTS_IN_TOURNAMENT - 1).bots(bot_elo)
+        opponent_skills = opponents.hidden_skills()
+        all_ranks = opponents.sample_ranks(ts, player.hidden_skill())
+        for game_ranks, game_opponent_skills in zip(all_ranks, opponent_skills):
+            mus = numpy.concatenate([[player.bot_match_elo], game_opponent_skills])
+            sigmas = numpy.concatenate([[player.bot_match_elo_sigma], numpy.full(len(game_opponent_skills), ESportsPlayer.starting_sigma() / 10)])
+            mus, sigmas = ts.rate_arrays(mus, sigmas, game_ranks)
+            player.bot_match_elo = float(mus[0])
+            player.bot_match_elo_sigma = float(sigmas[0])
+
+            mus[0], sigmas[0] = performance_mu, performance_sigma
+            mus, sigmas = ts.rate_arrays(mus, sigmas, game_ranks)
+            performance_mu, performance_sigma = float(mus[0]), float(sigmas[0])
+        player_placements = all_ranks[:, 0] + 1
 
         return [
             ComposedEvent(
@@ -275,7 +240,7 @@ class PlayBotMatchesSampler(ActionSampler):
                             f'{num_games} matches played\n'
                             f'{bot_elo:.0f} official bot rating\n'
                             f'{numpy.mean(player_placements):.1f}/{NUM_BOTS_IN_TOURNAMENT + 1} average placement\n'
-                            f'{performance_tracker.bot_match_elo:.0f} performance in those games\n'
+                            f'{performance_mu:.0f} performance in those games\n'
                             f'-> {player.bot_match_elo:.0f} skill rating ({player.bot_match_elo - rating_before:+.0f})',
                 events=[]
             ),
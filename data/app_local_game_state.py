@@ -1,9 +1,92 @@
+from typing import Optional, List, Callable, Dict
+
 from data.app_gamestate import AppGameState
+from data.esports_game import ESportsGame
+from data.esports_player import ESportsPlayer
+from data.game_view_model import StateViewModel
 from data.local_game_state import LocalGameState
+from lib.json_diff import apply_json_diff_to_copy, JSONDiffOp
+from network.my_types import JSONInfo
+from network.state_updates import changed_depths
 
 
 class AppLocalGameState(LocalGameState):
     game_state: AppGameState
 
+    def __init__(self, game_state: AppGameState, main_user_name: str):
+        super().__init__(game_state, main_user_name)
+        self.state_json: Optional[JSONInfo] = None  # the game state as last received from the server
+        self.depths: Optional[List[int]] = None  # the depths whose details state_json contains, None for all
+        self.revision = 0  # counts changes of game_state, including optimistic ones that keep the version
+        self._view_model: Optional[StateViewModel] = None
+        self.depth_revisions: Dict[int, int] = {}  # the revision in which the game at a depth last changed
+        self.replaced_revisions: Dict[int, int] = {}  # the revision in which all games from a depth on were last replaced
+
     def game_to_show(self):
-        return self.game_state.lowest_level_game()
\ No newline at end of file
+        return self.game_state.lowest_level_game()
+
+    def version(self):
+        return self.game_state.version
+
+    def epoch(self):
+        return self.game_state.epoch
+
+    def view_model(self) -> StateViewModel:
+        """Derived values for display, shared by all menus until the game state changes"""
+        if self._view_model is None or self._view_model.revision != self.revision:
+            self._view_model = StateViewModel(self.game_state, self.revision)
+        return self._view_model
+
+    def depth_revision(self, depth: int) -> int:
+        """The revision in which the game at `depth` last changed, windows showing it need updates only if this increased"""
+        revision = self.depth_revisions.get(depth, 0)
+        for from_depth, replaced_revision in self.replaced_revisions.items():
+            if from_depth <= depth:
+                revision = max(revision, replaced_revision)
+        return revision
+
+    def apply_full_state(self, state_json: JSONInfo, depths: Optional[List[int]] = None):
+        self.state_json = state_json
+        self.depths = depths
+        self.game_state.update_from_json(state_json)
+        self.revision += 1
+        self.depth_revisions.clear()
+        self.replaced_revisions = {0: self.revision}
+
+    def apply_state_diff(self, base_version: int, version: int, diff: List[JSONDiffOp]) -> bool:
+        """Returns False if the diff does not fit the local state, then the full state needs to be requested instead"""
+        if self.state_json is None or self.version() != base_version:
+            return False
+        try:
+            state_json = {**apply_json_diff_to_copy(self.state_json, diff), 'version': version}
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print('Could not apply state diff:', repr(e))
+            return False
+        self.state_json = state_json
+        self.game_state.update_from_json(self.state_json)
+        self.revision += 1
+        depths, replaced_from = changed_depths(diff)
+        for depth in depths:
+            self.depth_revisions[depth] = self.revision
+        if replaced_from is not None:
+            self.replaced_revisions[replaced_from] = self.revision
+        return True
+
+    def apply_optimistically(self, state_version: Optional[int], depth: int, change: Callable[[ESportsGame, ESportsPlayer], None]) -> bool:
+        """
+        Applies a change that the server already made to the game at `depth` and the player of the main user,
+        without waiting for the new state. The next state from the server replaces the result, since it is built from `state_json`.
+        Returns False if the state of `state_version` already arrived and contains the change.
+        """
+        if state_version is None or self.version() >= state_version:
+            return False
+        game = self.game_state.game_at_depth(depth)
+        if game is None:
+            return False
+        player = game.player_controlled_by(self.main_user_name)
+        if player is None:
+            return False
+        change(game, player)
+        self.revision += 1
+        self.depth_revisions[depth] = self.revision
+        return True
@@ -1,3 +1,4 @@
+import functools
 import re
 from typing import List, Type
 
@@ -103,6 +104,7 @@ def clan_tag_valid(username) -> bool:
     return False
 
 
+@functools.lru_cache(maxsize=4096)  # displayed for every player on every update
 def clan_tag_from_name(username):
     for fmt in CLAN_TAG_FORMATS:
         if fmt.usable(username):
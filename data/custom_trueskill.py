@@ -1,10 +1,13 @@
 import itertools
 import math
 import random
-from typing import List, Iterable, Tuple
+from typing import List, Iterable, Tuple, Sequence
 
+import numpy
 import numpy.random
-from trueskill import TrueSkill, Rating
+from trueskill import TrueSkill, Rating, DELTA, calc_draw_margin
+
+MAX_SCHEDULE_ITERATIONS = 10  # the same limit as in TrueSkill.run_schedule
 
 
 class CustomTrueSkill(TrueSkill):
@@ -31,20 +34,192 @@ class CustomTrueSkill(TrueSkill):
         lose_probability = 1 - win_probability
         return win_probability / lose_probability
 
-    def sample_ranks(self, rating_groups: List[Tuple[Rating]]):
-        performances = [
-            sum([
-                self.sample_performance(rating.mu)
-                for rating in rating_group
-            ])
-            for rating_group in rating_groups
-        ]
-        sorted_performances = sorted(performances, reverse=True)
-        ranks = [
-            sorted_performances.index(p)
-            for p in performances
-        ]
-        return ranks
+    def rate(self, rating_groups, ranks=None, weights=None, min_delta=DELTA):
+        if self.is_free_for_all(rating_groups, ranks, weights, min_delta):
+            return self.rate_free_for_all(rating_groups, ranks, min_delta)
+        return super().rate(rating_groups, ranks, weights, min_delta)
+
+    def is_free_for_all(self, rating_groups, ranks, weights, min_delta) -> bool:
+        """Single players without ties and weights, the case that `rate_free_for_all` handles"""
+        if weights is not None or callable(self.draw_probability) or min_delta <= 0:
+            return False
+        if isinstance(rating_groups, dict) or len(rating_groups) < 2:
+            return False
+        if not all(isinstance(group, (tuple, list)) and len(group) == 1 for group in rating_groups):
+            return False
+        if ranks is not None and (len(ranks) != len(rating_groups) or len(set(ranks)) != len(ranks)):
+            return False
+        return True
+
+    def rate_free_for_all(self, rating_groups, ranks=None, min_delta=DELTA) -> List[Tuple[Rating]]:
+        """
+        The result of `TrueSkill.rate` for single-player teams with distinct ranks, without building a factor graph.
+        Runs the same message schedule on plain arrays: the layers of independent players at once with NumPy,
+        the chain of team differences as scalar updates.
+        """
+        if ranks is None:
+            ranks = range(len(rating_groups))
+        mus = numpy.array([group[0].mu for group in rating_groups], dtype=float)
+        sigmas = numpy.array([group[0].sigma for group in rating_groups], dtype=float)
+        new_mus, new_sigmas = self.rate_arrays(mus, sigmas, ranks, min_delta)
+        return [(Rating(float(mu), float(sigma)),) for mu, sigma in zip(new_mus, new_sigmas)]
+
+    def rate_arrays(self, mus: numpy.ndarray, sigmas: numpy.ndarray, ranks, min_delta=DELTA) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """`rate_free_for_all` for players given as arrays of their ratings, returns the new mus and sigmas"""
+        order = numpy.argsort(ranks, kind='stable')
+        mus = numpy.asarray(mus, dtype=float)[order]
+        sigmas = numpy.asarray(sigmas, dtype=float)[order]
+
+        # rating layer: the prior with dynamics
+        rating_pi = numpy.sqrt(sigmas ** 2 + self.tau ** 2) ** -2
+        rating_tau = rating_pi * mus
+        # performance layer, the likelihood factors pass their message down to the team performances unchanged
+        a = 1 / (1 + self.beta ** 2 * rating_pi)
+        perf_pi = a * rating_pi
+        perf_tau = a * rating_tau
+
+        team_pi, team_tau = self.run_difference_chain(perf_pi.tolist(), perf_tau.tolist(), min_delta)
+
+        # messages back up: from the team performances through the likelihood factors to the ratings
+        message_pi = numpy.array(team_pi) - perf_pi
+        message_tau = numpy.array(team_tau) - perf_tau
+        a = 1 / (1 + self.beta ** 2 * message_pi)
+        rating_pi = rating_pi + a * message_pi
+        rating_tau = rating_tau + a * message_tau
+
+        new_mus = numpy.empty_like(mus)
+        new_sigmas = numpy.empty_like(sigmas)
+        new_mus[order] = rating_tau / rating_pi
+        new_sigmas[order] = numpy.sqrt(1 / rating_pi)
+        return new_mus, new_sigmas
+
+    def run_difference_chain(self, team_pi: List[float], team_tau: List[float], min_delta: float):
+        """
+        Expectation propagation along the differences of neighboring team performances, sorted by rank.
+        `team_pi` and `team_tau` hold the messages of the players' performances and are updated in place.
+        """
+        num_diffs = len(team_pi) - 1
+        draw_margin = calc_draw_margin(self.draw_probability, 2, self)
+        # messages of each difference factor to its left and right team, to its difference variable and of the truncation
+        left_pi, left_tau = [0.] * num_diffs, [0.] * num_diffs
+        right_pi, right_tau = [0.] * num_diffs, [0.] * num_diffs
+        sum_pi, sum_tau = [0.] * num_diffs, [0.] * num_diffs
+        trunc_pi, trunc_tau = [0.] * num_diffs, [0.] * num_diffs
+        diff_pi, diff_tau = [0.] * num_diffs, [0.] * num_diffs
+
+        def down(x):
+            l_pi, l_tau = team_pi[x] - left_pi[x], team_tau[x] - left_tau[x]
+            r_pi, r_tau = team_pi[x + 1] - right_pi[x], team_tau[x + 1] - right_tau[x]
+            pi = 1 / (_inverse(l_pi) + _inverse(r_pi))
+            tau = pi * (_mean(l_pi, l_tau) - _mean(r_pi, r_tau))
+            diff_pi[x] += pi - sum_pi[x]
+            diff_tau[x] += tau - sum_tau[x]
+            sum_pi[x], sum_tau[x] = pi, tau
+
+        def truncate(x) -> float:
+            div_pi, div_tau = diff_pi[x] - trunc_pi[x], diff_tau[x] - trunc_tau[x]
+            sqrt_pi = math.sqrt(div_pi)
+            try:
+                v = self.v_win(div_tau / sqrt_pi, draw_margin * sqrt_pi)
+                w = self.w_win(div_tau / sqrt_pi, draw_margin * sqrt_pi)
+            except FloatingPointError:
+                # huge upsets in large fields, where TrueSkill.rate gives up
+                v, w = _v_w_win_tail(div_tau / sqrt_pi - draw_margin * sqrt_pi)
+            pi = div_pi / (1 - w)
+            tau = (div_tau + sqrt_pi * v) / (1 - w)
+            pi_delta = abs(diff_pi[x] - pi)
+            delta = 0 if math.isinf(pi_delta) else max(abs(diff_tau[x] - tau), math.sqrt(pi_delta))
+            trunc_pi[x] += pi - diff_pi[x]
+            trunc_tau[x] += tau - diff_tau[x]
+            diff_pi[x], diff_tau[x] = pi, tau
+            return delta
+
+        def up_left(x):
+            d_pi, d_tau = diff_pi[x] - sum_pi[x], diff_tau[x] - sum_tau[x]
+            r_pi, r_tau = team_pi[x + 1] - right_pi[x], team_tau[x + 1] - right_tau[x]
+            pi = 1 / (_inverse(d_pi) + _inverse(r_pi))
+            tau = pi * (_mean(d_pi, d_tau) + _mean(r_pi, r_tau))
+            team_pi[x] += pi - left_pi[x]
+            team_tau[x] += tau - left_tau[x]
+            left_pi[x], left_tau[x] = pi, tau
+
+        def up_right(x):
+            l_pi, l_tau = team_pi[x] - left_pi[x], team_tau[x] - left_tau[x]
+            d_pi, d_tau = diff_pi[x] - sum_pi[x], diff_tau[x] - sum_tau[x]
+            pi = 1 / (_inverse(l_pi) + _inverse(d_pi))
+            tau = pi * (_mean(l_pi, l_tau) - _mean(d_pi, d_tau))
+            team_pi[x + 1] += pi - right_pi[x]
+            team_tau[x + 1] += tau - right_tau[x]
+            right_pi[x], right_tau[x] = pi, tau
+
+        if num_diffs == 1:
+            down(0)
+            truncate(0)
+        else:
+            for _ in range(MAX_SCHEDULE_ITERATIONS):
+                delta = 0
+                for x in range(num_diffs - 1):
+                    down(x)
+                    delta = max(delta, truncate(x))
+                    up_right(x)
+                for x in range(num_diffs - 1, 0, -1):
+                    down(x)
+                    delta = max(delta, truncate(x))
+                    up_left(x)
+                if delta <= min_delta:
+                    break
+        up_left(0)
+        up_right(num_diffs - 1)
+        return team_pi, team_tau
+
+    def sample_ranks(self, rating_groups: List[Tuple[Rating]]) -> List[int]:
+        """0-based ranks of the rating groups in one match, sampled from the performances of their members"""
+        return self.sample_ranks_of_matches([rating_groups])[0].tolist()
+
+    def sample_ranks_of_matches(self, matches: Sequence[Sequence[Tuple[Rating]]]) -> numpy.ndarray:
+        """
+        Samples many independent matches at once. All matches need the same number of rating groups with the same sizes.
+        Row i holds the 0-based ranks of the groups in match i.
+        """
+        group_sizes = [len(rating_group) for rating_group in matches[0]]
+        for rating_groups in matches:
+            if [len(rating_group) for rating_group in rating_groups] != group_sizes:
+                raise ValueError('All matches need rating groups of the same sizes')
+        mus = numpy.array([[rating.mu for rating_group in rating_groups for rating in rating_group]
+                           for rating_groups in matches], dtype=float)
+        performances = numpy.random.normal(mus, self.beta)
+        if any(size != 1 for size in group_sizes):
+            group_starts = numpy.cumsum([0] + group_sizes[:-1])
+            performances = numpy.add.reduceat(performances, group_starts, axis=1)
+        return self.ranks_from_performances(performances)
+
+    def sample_ranks_of_skills(self, skills: numpy.ndarray) -> numpy.ndarray:
+        """`sample_ranks_of_matches` for single players, given as an array of their skills with one row per match"""
+        return self.ranks_from_performances(numpy.random.normal(skills, self.beta))
+
+    @staticmethod
+    def ranks_from_performances(performances: numpy.ndarray) -> numpy.ndarray:
+        """The best performance gets rank 0, along the last axis"""
+        order = numpy.argsort(-performances, axis=-1, kind='stable')
+        return numpy.argsort(order, axis=-1, kind='stable')
 
     def sample_performance(self, mu: float):
         return random.normalvariate(mu, self.beta)
+
+
+def _inverse(pi: float) -> float:
+    """The variance of a Gaussian in natural parameters"""
+    return 1 / pi if pi else math.inf
+
+
+def _mean(pi: float, tau: float) -> float:
+    return tau / pi if pi else 0.
+
+
+def _v_w_win_tail(x: float) -> Tuple[float, float]:
+    """The v and w functions of a win far in the tails of the normal distribution, from the asymptotic series of its cdf"""
+    if x >= 0:
+        return 0., 0.
+    t = -x
+    v = t / (1 - t ** -2 + 3 * t ** -4 - 15 * t ** -6)
+    return v, v * (v - t)
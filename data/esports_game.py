@@ -77,7 +77,8 @@ class ESportsGame(EBCP):
                 return False
         return True
 
-    def start_match(self):
+    def start_match(self) -> Dict[PlayerName, str]:
+        """The players whose ready status was cleared, with the reason"""
         if self.ongoing_match is not None:
             raise RuntimeError("Match is already ongoing")
         self.ongoing_match = ESportsGame()
@@ -85,9 +86,10 @@ class ESportsGame(EBCP):
         for player, controller in zip(self.ongoing_match.players.values(), self.players.values()):
             player.controller = controller.controller
             player.manager = controller.name
-        self.cleanup_ready_players()
+        return self.cleanup_ready_players()
 
-    def skip_to_end_of_ongoing_match(self):
+    def skip_to_end_of_ongoing_match(self) -> Dict[PlayerName, str]:
+        """The players whose ready status was cleared, with the reason"""
         if self.ongoing_match is None:
             raise RuntimeError("No ongoing match to skip")
         ts = CustomTrueSkill()
@@ -118,21 +120,24 @@ class ESportsGame(EBCP):
                                                    rating_before=[old_ratings[players.index(player)][0].mu for _, player in sorted_player_ranks],
                                                    rating_after=[new_ratings[players.index(player)][0].mu for _, player in sorted_player_ranks]))
         self.ongoing_match = None
-        self.cleanup_ready_players()
+        return self.cleanup_ready_players()
 
-    def cleanup_ready_players(self):
+    def cleanup_ready_players(self) -> Dict[PlayerName, str]:
+        """Clears ready statuses that wait for something that already happened, returns the reason for each cleared player"""
+        cleared = {}
         for player_name, ready_for in list(self.ready_players.items()):
             last_ended_game_idx = len(self.game_results) - 1
             if ready_for.match_idx <= last_ended_game_idx:
-                print('Clearing ready status of player', player_name, ' because game has already ended.')
+                cleared[player_name] = 'game has already ended'
                 del self.ready_players[player_name]
                 continue
             if ready_for.match_state == 'match_begin':
                 if ready_for.match_idx == last_ended_game_idx + 1:
                     if self.ongoing_match is not None:
-                        print('Clearing ready status of player', player_name, ' because game has already started.')
+                        cleared[player_name] = 'game has already started'
                         del self.ready_players[player_name]
                         continue
+        return cleared
 
     def condition_to_wait_for_next_start_of_match(self):
         matches_played = len(self.game_results)
@@ -14,6 +14,9 @@ class ComposedEvent(GameEvent):
         for event in self.events:
             event.apply(game, player)
 
+    def deterministic(self) -> bool:
+        return all(event.deterministic() for event in self.events)
+
     def short_notation(self):
         return '\n'.join(event.short_notation() for event in self.events)
 
@@ -44,6 +47,9 @@ class EventAffectingOtherPlayer(GameEvent):
     def apply(self, game: ESportsGame, player: ESportsPlayer):
         self.event.apply(game, game.players[self.player_name])
 
+    def deterministic(self) -> bool:
+        return self.event.deterministic()
+
     def short_notation(self):
         return f"{self.event.short_notation()} for {self.player_name}"
 
@@ -10,6 +10,10 @@ class GameEvent(EBCP):
     def apply(self, game: 'ESportsGame', player: 'ESportsPlayer'):
         raise NotImplementedError("Abstract method")
 
+    def deterministic(self) -> bool:
+        """False if `apply` samples something, then a client replaying the event would get a different result than the server"""
+        return True
+
     def text_description(self):
         return self.short_notation()
 
@@ -1,9 +1,10 @@
 import json
 import os
 import pickle
-from typing import List, Literal, Any, Dict
+from typing import List, Literal, Any, Dict, Optional
+from uuid import uuid4
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr, Field
 
 from data.user import User
 from lib.util import EBCP
@@ -14,28 +15,44 @@ class GameState(EBCP):
     type: str = 'GameState'
     game_name: str
     users: List[User] = []
+    version: int = 0  # increased whenever a commit changes what users can see, see network.state_updates
+    # versions are only comparable within an epoch: a new game with the same name starts again at version 0,
+    # and offline jobs change the save without increasing the version
+    epoch: str = Field(default_factory=lambda: uuid4().hex)
+
+    # indexes over self.users, kept consistent by new_user, set_session_id and rebuild_user_indexes
+    _users_by_name: Dict[UserName, User] = PrivateAttr(default_factory=dict)
+    _users_by_session_id: Dict[str, User] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context: Any) -> None:
+        self.rebuild_user_indexes()
+
+    def rebuild_user_indexes(self):
+        self._users_by_name = {u.username: u for u in self.users}
+        self._users_by_session_id = {u.session_id: u for u in self.users if u.session_id is not None}
 
     def valid_session_id(self, session_id: str):
-        for u in self.users:
-            if u.session_id == session_id:
-                return True
-        else:
-            return False
+        return session_id is not None and session_id in self._users_by_session_id
 
     def user_by_name(self, user_name):
-        for user in self.users:
-            if user.username == user_name:
-                return user
+        return self._users_by_name.get(user_name)
 
     def username_by_session_id(self, session_id: str):
         u = self.user_by_session_id(session_id)
         if u is not None:
             return u.username
 
-    def user_by_session_id(self, session_id: str):
-        for u in self.users:
-            if u.session_id == session_id:
-                return u
+    def user_by_session_id(self, session_id: str) -> Optional[User]:
+        if session_id is None:
+            return None
+        return self._users_by_session_id.get(session_id)
+
+    def set_session_id(self, user: User, session_id: Optional[str]):
+        if self._users_by_session_id.get(user.session_id) is user:
+            del self._users_by_session_id[user.session_id]
+        user.session_id = session_id
+        if session_id is not None:
+            self._users_by_session_id[session_id] = user
 
     def commit(self):
         save_name = self.save_file_name()
@@ -46,12 +63,16 @@ class GameState(EBCP):
             os.remove(save_name)
         os.rename(tmp_file_name, save_name)
 
+    def start_new_epoch(self):
+        self.epoch = uuid4().hex
+
     def rollback(self):
         if not os.path.isfile(self.save_file_name()):
             return
         loaded: GameState = self.load(self.game_name)
         assert type(self) == type(loaded)
         self.__dict__ = loaded.__dict__
+        self.rebuild_user_indexes()
 
     def save_file_name(self):
         game_name = self.game_name
@@ -81,6 +102,10 @@ class GameState(EBCP):
         return json_info
 
     def update_from_json(self, json_info: Dict[str, Any]):
+        if 'version' in json_info:
+            self.version = json_info['version']
+        if 'epoch' in json_info:
+            self.epoch = json_info['epoch']
         if 'users' in json_info:
             for user_info in json_info['users']:
                 if not self.user_name_exists(user_info['username']):
@@ -90,16 +115,28 @@ class GameState(EBCP):
                     if k == 'type':
                         assert v == 'AppUser', v
                         continue
+                    if k == 'session_id':
+                        self.set_session_id(user, v)
+                        continue
                     setattr(user, k, v)
 
     def new_user(self, user: User, initialize):
-        if any(u.username == user.username for u in self.users):
+        if self.user_name_exists(user.username):
             raise RuntimeError
         self.users.append(user)
+        self._users_by_name[user.username] = user
+        if user.session_id is not None:
+            self._users_by_session_id[user.session_id] = user
+
+    def remove_user(self, username: UserName):
+        user = self._users_by_name.pop(username)
+        self.users.remove(user)
+        if self._users_by_session_id.get(user.session_id) is user:
+            del self._users_by_session_id[user.session_id]
 
     @classmethod
     def create(cls, game_name):
         return GameState(users=[], game_name=game_name)
 
     def user_name_exists(self, username: UserName):
-        return any(u.username == username for u in self.users)
\ No newline at end of file
+        return username in self._users_by_name
@@ -0,0 +1,60 @@
+import functools
+from typing import Dict, List, Optional, Tuple
+
+from data.app_gamestate import AppGameState
+from data.esports_game import ESportsGame
+from data.esports_player import ESportsPlayer
+from data.league_table import LeagueTableRow, league_table_rows
+from data.player_name import PlayerName
+
+RANK_HISTORY_LENGTH = 3
+
+
+class GameViewModel:
+    """
+    Values derived from one game for display, such as clan tags, the leaderboard and the recent ranks of each player.
+    Computed once per state instead of by every menu on every update.
+    """
+
+    def __init__(self, game: ESportsGame):
+        self.game = game
+        self.tags_and_names: Dict[PlayerName, str] = {name: player.tag_and_name() for name, player in game.players.items()}
+        self.leaderboard: List[ESportsPlayer] = sorted(game.players.values(), key=ESportsPlayer.rank_sorting_key)
+        self.recent_ranks: Dict[PlayerName, List[int]] = {name: [] for name in game.players}  # most recent first
+        for result in reversed(game.game_results[-RANK_HISTORY_LENGTH:]):
+            for rank, player_name in enumerate(result.ranking):
+                if player_name in self.recent_ranks:
+                    self.recent_ranks[player_name].append(rank + 1)
+        self._match_summaries: Dict[Tuple[int, PlayerName], str] = {}
+
+    def recent_ranks_string(self, player_name: PlayerName) -> str:
+        """Same as `ESportsGame.previous_ranks_string` with n=RANK_HISTORY_LENGTH"""
+        ranks = self.recent_ranks.get(player_name, [])
+        if len(ranks) == 0:
+            return 'N/A'
+        return ' <- '.join(str(rank) for rank in ranks)
+
+    @functools.cached_property
+    def league_table_rows(self) -> List[LeagueTableRow]:
+        return league_table_rows(self)
+
+    def match_summary(self, match_idx: int, focus_on_player: PlayerName) -> str:
+        key = (match_idx, focus_on_player)
+        if key not in self._match_summaries:
+            self._match_summaries[key] = self.game.match_summary(match_idx, focus_on_player=focus_on_player)
+        return self._match_summaries[key]
+
+
+class StateViewModel:
+    """The view models of the games at all depths of one revision of the local game state, built on first access"""
+
+    def __init__(self, game_state: AppGameState, revision: int):
+        self.game_state = game_state
+        self.revision = revision
+        self._games: Dict[int, Optional[GameViewModel]] = {}
+
+    def game_at_depth(self, depth: int) -> Optional[GameViewModel]:
+        if depth not in self._games:
+            game = self.game_state.game_at_depth(depth)
+            self._games[depth] = None if game is None else GameViewModel(game)
+        return self._games[depth]
@@ -0,0 +1,44 @@
+import math
+import typing
+from typing import List, Tuple
+
+if typing.TYPE_CHECKING:
+    from data.game_view_model import GameViewModel
+
+LEAGUE_TABLE_COLUMNS = ['Place', 'Player name', 'Avg. ranking', 'Performance', 'Matches played', 'Result history']
+LeagueTableRow = Tuple[str, ...]  # the displayed text of each column
+
+
+def league_table_rows(view: 'GameViewModel') -> List[LeagueTableRow]:
+    players = view.leaderboard
+    matches_played = str(len(view.game.game_results))
+    rows = []
+    for row_idx, player in enumerate(players):
+        place_string = '#' + str(row_idx + 1)
+        add_leading_spaces = math.ceil(math.log(len(players), 10)) - len(str(row_idx + 1))
+        place_string = ' ' * add_leading_spaces + place_string
+        rows.append((
+            place_string,
+            view.tags_and_names[player.name],
+            f'{player.average_rank:.1f}',
+            str(round(player.tournament_elo)),
+            matches_played,
+            view.recent_ranks_string(player.name),
+        ))
+    return rows
+
+
+def changed_row_ranges(old_rows: List[LeagueTableRow], new_rows: List[LeagueTableRow]) -> List[Tuple[int, int]]:
+    """Inclusive (first, last) index ranges of consecutive rows that differ, among the rows that both lists have"""
+    ranges = []
+    first = None
+    for row_idx, (old_row, new_row) in enumerate(zip(old_rows, new_rows)):
+        if old_row != new_row:
+            if first is None:
+                first = row_idx
+        elif first is not None:
+            ranges.append((first, row_idx - 1))
+            first = None
+    if first is not None:
+        ranges.append((first, min(len(old_rows), len(new_rows)) - 1))
+    return ranges
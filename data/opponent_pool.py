@@ -0,0 +1,65 @@
+from typing import Union
+
+import numpy
+import numpy.random
+
+from config import NUM_BOTS_IN_TOURNAMENT, BASE_PLAYER_HEALTH, BASE_PLAYER_MOTIVATION
+from data.custom_trueskill import CustomTrueSkill
+from data.esports_player import ESportsPlayer
+
+PUBLIC_PLAYER_HANDICAP = 90  # those randoms are simply not as good as us professionals
+
+
+class OpponentPool:
+    """
+    The random opponents of the matches that an action simulates, as arrays with one row per match.
+    Replaces creating an `ESportsPlayer` for each of them.
+    """
+
+    def __init__(self, hidden_elos: numpy.ndarray, healths: numpy.ndarray, motivations: numpy.ndarray):
+        self.hidden_elos = hidden_elos
+        self.healths = healths
+        self.motivations = motivations
+
+    @classmethod
+    def create(cls, num_matches: int, num_opponents: int = NUM_BOTS_IN_TOURNAMENT) -> 'OpponentPool':
+        """Drawn like the players of `ESportsPlayer.create`"""
+        shape = (num_matches, num_opponents)
+        starting_elo = ESportsPlayer.starting_elo() - BASE_PLAYER_HEALTH - BASE_PLAYER_MOTIVATION
+        return OpponentPool(hidden_elos=numpy.random.normal(starting_elo, 100, shape),
+                            healths=numpy.random.normal(BASE_PLAYER_HEALTH, 5, shape),
+                            motivations=numpy.random.normal(BASE_PLAYER_MOTIVATION, 10, shape))
+
+    @property
+    def shape(self):
+        return self.hidden_elos.shape
+
+    def match(self, match_idx: int) -> 'OpponentPool':
+        """The opponents of a single match, still as a pool with one row"""
+        rows = slice(match_idx, match_idx + 1)
+        return OpponentPool(self.hidden_elos[rows], self.healths[rows], self.motivations[rows])
+
+    def public_players(self, player_rating: Union[float, numpy.ndarray]) -> 'OpponentPool':
+        """
+        Opponents in ranked and unranked matches against a player with this rating, or one rating per match.
+        Weaker players are paired against weaker opponents, and there is some extra skill fluctuation.
+        """
+        player_rating = numpy.reshape(player_rating, (-1, 1))
+        hidden_elos = self.hidden_elos - PUBLIC_PLAYER_HANDICAP
+        hidden_elos = numpy.where(hidden_elos > player_rating,
+                                  player_rating + numpy.random.normal(0, 100, self.shape),
+                                  hidden_elos)
+        hidden_elos += numpy.random.normal(0, 100, self.shape)
+        return OpponentPool(hidden_elos, self.healths, self.motivations)
+
+    def bots(self, bot_elo: float) -> 'OpponentPool':
+        """Opponents in bot matches, that all have the same elo apart from their health and motivation"""
+        return OpponentPool(numpy.full(self.shape, float(bot_elo)), self.healths, self.motivations)
+
+    def hidden_skills(self) -> numpy.ndarray:
+        return self.hidden_elos + self.healths + self.motivations
+
+    def sample_ranks(self, ts: CustomTrueSkill, player_skill: float) -> numpy.ndarray:
+        """Simulates all matches at once. Row i holds the 0-based ranks in match i, the player first and then the opponents."""
+        skills = numpy.concatenate([numpy.full((self.shape[0], 1), player_skill), self.hidden_skills()], axis=1)
+        return ts.sample_ranks_of_skills(skills)
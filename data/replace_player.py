@@ -18,5 +18,8 @@ class ReplacePlayerWithNewlyGeneratedPlayer(GameEvent):
         new_player.days_until_next_match = player.days_until_next_match
         new_player.controller, player.controller = player.controller, new_player.controller
 
+    def deterministic(self) -> bool:
+        return False  # the new player is a random one
+
     def short_notation(self):
         return f"-> Player replacement"
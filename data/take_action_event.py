@@ -15,6 +15,9 @@ class TakeActionEvent(GameEvent):
         for e in self.sampled_events:
             e.apply(game, player)
 
+    def deterministic(self) -> bool:
+        return self.sampled_events is not None and all(e.deterministic() for e in self.sampled_events)
+
     def setup_if_needed(self, game, player):
         if self.sampled_events is None:
             self.sampled_events = EventSampler().get_events_for_action(game, player, self.action_name)
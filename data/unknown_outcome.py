@@ -17,6 +17,9 @@ class UnknownOutcome(GameEvent):
         event: GameEvent = self.sample_event()
         event.apply(game, player)
 
+    def deterministic(self) -> bool:
+        return False
+
     def sample_event(self) -> GameEvent:
         return random.choices(
             self.possibilities,
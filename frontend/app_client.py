@@ -1,4 +1,5 @@
-from typing import List
+import threading
+from typing import List, Optional
 
 from PyQt5 import QtWidgets
 
@@ -8,6 +9,7 @@ from frontend.src.settings_menu import SettingsMenu
 from frontend.src.waiting_menu import WaitingMenu
 from data.waiting_condition import WaitingCondition
 from lib.util import EBC
+from stories.subscribe_to_depths import SubscribeToDepths
 
 
 class NotAPattern(EBC):
@@ -22,6 +24,7 @@ class AppClient(Client):
         self.waiting_menus: List[WaitingMenu] = []
         self.open_windows: List[QtWidgets.QMainWindow] = []
         self.closed = False
+        self.subscribed_depths: Optional[List[int]] = None
 
     def open_first_window(self):
         self.open_manager_window()
@@ -34,7 +37,9 @@ class AppClient(Client):
             crafting_window.show()
             self.manager_menus.append(crafting_ui)
             self.open_windows.append(crafting_window)
-            self.check_game_state()
+            self.update_windows()
+            if not self.update_subscriptions():
+                self.check_game_state()
 
     def manager_menu_open(self, depth: int):
         for m in self.manager_menus:
@@ -49,6 +54,13 @@ class AppClient(Client):
             if m.depth == depth and not m.closed:
                 return m
 
+    def waiting_for_match_transition(self) -> bool:
+        return any(not ui.closed for ui in self.waiting_menus)
+
+    def minimized(self) -> bool:
+        windows = [self.MainWindow] + self.open_windows
+        return all(window.isMinimized() or not window.isVisible() for window in windows)
+
     def open_settings_window(self):
         with self.handling_errors():
             settings_window = QtWidgets.QMainWindow()
@@ -59,13 +71,57 @@ class AppClient(Client):
             self.open_windows.append(settings_window)
 
     def after_state_update(self):
+        self.update_windows()
+        self.update_subscriptions()
+
+    def update_windows(self):
+        """Updates the visible windows that show a depth of the game state that changed since they were last updated"""
+        if self.local_gamestate is None or self.local_gamestate.state_json is None:
+            return
         gs = self.local_gamestate.game_state
         for menu_list in [self.manager_menus, self.settings_menus, self.waiting_menus]:
             self.cleanup_closed_menus(menu_list)
             for ui in menu_list:
+                if ui.closed or not self.window_visible(ui):
+                    continue  # catches up once it is shown again, see `poll_if_due`
+                if isinstance(ui, SettingsMenu):
+                    revision = self.local_gamestate.revision
+                else:
+                    revision = self.local_gamestate.depth_revision(ui.depth)
+                if revision == ui.shown_revision:
+                    continue
+                ui.shown_revision = revision
                 ui.update_gamestate(gs)
             self.cleanup_closed_menus(menu_list)
 
+    @staticmethod
+    def window_visible(ui) -> bool:
+        window = ui.centralwidget.window()
+        return window.isVisible() and not window.isMinimized()
+
+    def poll_if_due(self):
+        super().poll_if_due()
+        if threading.current_thread() is threading.main_thread():
+            self.update_windows()
+
+    def update_subscriptions(self) -> bool:
+        """Subscribes to the depths that have a window open, returns True if they changed and the game state was requested"""
+        if self.local_gamestate is None:
+            return False
+        depths = {ui.depth for ui in self.manager_menus + self.waiting_menus if not ui.closed}
+        # stop_micro_manage waits for the end of the parent match, which needs the results of the parent game
+        depths |= {ui.depth - 1 for ui in self.manager_menus if not ui.closed and ui.depth > 0}
+        depths = sorted(depths)
+        if depths == self.subscribed_depths:
+            return False
+        self.subscribed_depths = depths
+        SubscribeToDepths(self.ui, depths)()
+        return True
+
+    def close_server_connection(self):
+        super().close_server_connection()
+        self.subscribed_depths = None
+
     def cleanup_closed_menus(self, menu_list):
         for ui in menu_list.copy():
             if ui.closed:
@@ -81,5 +137,6 @@ class AppClient(Client):
             self.waiting_menus.append(waiting_ui)
             self.open_windows.append(waiting_window)
             waiting_ui.ready(True)
-            self.check_game_state()
+            if not self.update_subscriptions():
+                self.check_game_state()
         return waiting_ui
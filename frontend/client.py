@@ -1,23 +1,26 @@
 import json
 import sys
 import threading
+import time
+from concurrent.futures import Future
 from queue import Queue, Empty
-from typing import Optional, Dict, List, Tuple
-from uuid import uuid4
+from typing import Optional, List, Tuple, Callable
 
-import websocket
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import QMessageBox
 
 import stories.check_game_state
+import stories.resume_push_stream
 from data.app_local_game_state import AppLocalGameState
 from debug import debug
 from frontend.src.main_menu import MainMenu
-from lib.compact_dict_string import compact_object_string
+from frontend.state_cache import state_cache
 from lib.infinite_timer import InfiniteTimer
 from lib.print_exc_plus import print_exc_plus
 from lib.util import EBC
-from network.my_types import JSONInfo
+from network.my_types import JSONInfo, MessageType, Message
+from network.server_connection import ServerConnection
+from network.state_updates import GAME_STATE_UPDATE
 from stories.error_message import ConnectionErrorMessage, ErrorMessage
 from stories.success_message import SuccessMessage
 
@@ -27,6 +30,14 @@ class SignallableWindow(QtWidgets.QMainWindow):
 
 
 class Client(EBC):
+    # The server pushes state updates, polling is only needed in case one got lost.
+    # Polls are answered with "not modified" if the state did not change, so they are cheap.
+    POLLING_TIMER_SECONDS = 1
+    FAST_POLLING_SECONDS = 2  # while waiting for a match to start or end
+    IDLE_POLLING_SECONDS = 5  # doubles with every poll that did not change anything
+    MAX_POLLING_SECONDS = 120  # also used while minimized
+    STATE_CACHE_SECONDS = 60  # how often the received state is saved to disk, for showing it right away after reconnecting
+
     class ErrorHandling(EBC):
         def __init__(self, ui, client: 'Client'):
             self.client = client
@@ -56,7 +67,7 @@ class Client(EBC):
             elif isinstance(e, ConnectionResetError):
                 print_exc_plus()
                 try:
-                    self.client.websocket.close()
+                    self.client.server_connection.close()
                 except ConnectionResetError:
                     pass
                 self.ui.critical('ConnectionResetError', 'Lost connection to server. Trying to reconnect...')
@@ -73,12 +84,20 @@ class Client(EBC):
         self.ui = MainMenu(self)
         self.ui.setupUi(self.MainWindow)
         self.local_gamestate: Optional[AppLocalGameState] = None
-        self.websocket: websocket.WebSocket = websocket.WebSocket()
-        self.response_collection: Dict[str, JSONInfo] = {}
-        self.host = None
         self.check_game_state = stories.check_game_state.CheckGameState(self.ui)
-        self.check_game_state_timer = InfiniteTimer(seconds=5, target=self.check_game_state)
-        self.check_game_state_timer.start()
+        self.resume_push_stream = stories.resume_push_stream.ResumePushStream(self.ui)
+        self.server_connection = ServerConnection(push_message_handler=self.handle_push_message,
+                                                  reconnect_handler=self.resume_push_stream,
+                                                  result_handler=self.run_on_main_thread)
+        self.host = None
+        self.last_state_update = time.perf_counter()
+        self.last_poll = time.perf_counter()
+        self.unchanged_polls = 0
+        self.state_cache = state_cache
+        self.last_state_cache_save = time.perf_counter()
+        self.cached_revision: Optional[int] = None  # of the local game state that was last saved to disk
+        self.update_timer = InfiniteTimer(seconds=self.POLLING_TIMER_SECONDS, target=self.poll_if_due)
+        self.update_timer.start()
         self.message_queue = Queue()
         self.MainWindow.new_message.connect(self.process_messages)
         self.last_crafted_recipe = None
@@ -98,59 +117,89 @@ class Client(EBC):
             return
         message()
 
+    def run_on_main_thread(self, function: Callable[[], None]):
+        self.message_queue.put(function)
+        self.MainWindow.new_message.emit()
+
+    def poll_if_due(self):
+        if threading.current_thread() is not threading.main_thread():
+            self.run_on_main_thread(self.poll_if_due)
+            return
+        if self.local_gamestate is None or not self.server_connection.connected():
+            return
+        if time.perf_counter() - max(self.last_state_update, self.last_poll) >= self.polling_interval():
+            self.last_poll = time.perf_counter()
+            self.check_game_state()
+        if time.perf_counter() - self.last_state_cache_save >= self.STATE_CACHE_SECONDS:
+            self.save_state_cache()
+
+    def polling_interval(self) -> float:
+        if self.minimized():
+            return self.MAX_POLLING_SECONDS
+        if self.waiting_for_match_transition():
+            return self.FAST_POLLING_SECONDS
+        return min(self.IDLE_POLLING_SECONDS * 2 ** self.unchanged_polls, self.MAX_POLLING_SECONDS)
+
+    def waiting_for_match_transition(self) -> bool:
+        return False
+
+    def minimized(self) -> bool:
+        return self.MainWindow.isMinimized()
+
+    def handle_push_message(self, message_type: MessageType, contents: Message):
+        # called on the network thread
+        self.run_on_main_thread(lambda: self.apply_push_message(message_type, contents))
+
+    def apply_push_message(self, message_type: MessageType, contents: Message):
+        if message_type == GAME_STATE_UPDATE:
+            if self.local_gamestate is None:
+                return
+            if contents['version'] <= self.local_gamestate.version():
+                return  # already contained in a full state received in the meantime
+            if self.local_gamestate.apply_state_diff(**contents):
+                self.last_state_update = time.perf_counter()
+                self.unchanged_polls = 0
+                self.after_state_update()
+            else:  # missed an update
+                self.check_game_state()
+
     def run(self):
         self.MainWindow.show()
-        sys.exit(self.app.exec_())
+        exit_code = self.app.exec_()
+        self.save_state_cache()
+        sys.exit(exit_code)
+
+    def save_state_cache(self):
+        """Saves the state last received from the server to disk, if it changed since the last time"""
+        self.last_state_cache_save = time.perf_counter()
+        local_gamestate = self.local_gamestate
+        if local_gamestate is None or local_gamestate.state_json is None or self.host is None:
+            return
+        if local_gamestate.revision == self.cached_revision:
+            return
+        try:
+            self.state_cache.save(self.host, local_gamestate.game_state.game_name, local_gamestate.main_user_name,
+                                  local_gamestate.state_json, local_gamestate.depths)
+        except OSError:
+            print_exc_plus()
+            return
+        self.cached_revision = local_gamestate.revision
 
     def close_server_connection(self):
-        self.websocket.close()
+        self.save_state_cache()
+        self.cached_revision = None
+        if debug:
+            print('Network statistics:', json.dumps(self.server_connection.statistics(), indent=2))
+        self.server_connection.close()
+        self.server_connection.set_push_stream_position(None, None)
         self.host = None
 
     def server_request(self, host: str, route: str, data: JSONInfo) -> JSONInfo:
-        if not self.websocket.connected:
-            host = host.replace('http://', 'ws://')
-            self.websocket.connect(host + '/websocket')
-        token = str(uuid4())
-        data = json.dumps({'route': route, 'body': data, 'request_token': token})
-        if debug:
-            print('Sending to websocket:', str(data).replace('{', '\n{')[1:])
-        self.websocket.send(data, opcode=2)
-        json_content = self._receive_answer(token)
+        return self.server_connection.server_request(host, route, data)
 
-        status_code = json_content['http_status_code']
-        if status_code == 200:
-            pass
-        else:
-            formatted_request = compact_object_string(json.loads(data), max_line_length=100)
-            formatted_response = compact_object_string(json_content, max_line_length=100)
-            if 'body' in json_content and 'error' in json_content['body'] and not debug:
-                raise ConnectionErrorMessage(title=f'Failed request: Code {status_code}', msg=json_content['body']['error'])
-            else:
-                raise ConnectionErrorMessage(title=f'Failed request: Code {status_code}',
-                                             msg=f'A network request to "{host}" failed.\nRequest was: \n```\n{formatted_request}\n```\nResponse was:\n```\n{formatted_response}\n```')
-
-        return json_content['body']
-
-    def _receive_answer(self, token: str):
-        """Waits until the server sends an answer that contains the desired request_token.
-        All intermediate requests are also collected for later use, or, if they contain no token, they are just printed out.
-        """
-        if token in self.response_collection:
-            json_content = self.response_collection[token]
-            del self.response_collection[token]
-            return json_content
-
-        json_content = {}
-        while 'request_token' not in json_content or json_content['request_token'] != token:
-            if 'request_token' in json_content:
-                self.response_collection[json_content['request_token']] = json_content
-            received = self.websocket.recv_data_frame()[1].data
-            content = received.decode('utf-8')
-            json_content = json.loads(content)
-            if debug:
-                print('Received through websocket:\n' + compact_object_string(json_content, max_line_length=200, max_depth=3))
-
-        return json_content
+    def server_request_async(self, host: str, route: str, data: JSONInfo, callback: Callable[[Future], None]) -> Future:
+        """Does not block the GUI, `callback` is called on the main thread once the answer arrived"""
+        return self.server_connection.server_request_async(host, route, data, callback)
 
     def after_state_update(self):
         pass
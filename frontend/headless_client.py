@@ -0,0 +1,184 @@
+"""
+A client without user interface, for scripted managers, bots and tests.
+It sends the same requests as the game client through the routes of the existing stories, but needs neither PyQt nor an event loop.
+Example:
+    client = HeadlessClient('http://127.0.0.1:8000')
+    client.join('Some Manager')
+    client.take_action('rankedButton')
+    client.set_ready(True)
+    client.close()
+"""
+import threading
+import time
+from typing import Optional, List, Callable
+
+from data.app_gamestate import AppGameState
+from data.app_local_game_state import AppLocalGameState
+from data.app_user import AppUser
+from data.esports_game import ESportsGame
+from data.esports_player import ESportsPlayer
+from data.game_event_base import GameEvent
+from data.manager_choice import ManagerChoice
+from data.waiting_condition import WaitingCondition
+from lib.util import EBC
+from network.my_types import JSONInfo, MessageType, Message, UserName
+from network.server_connection import ServerConnection
+from network.state_updates import GAME_STATE_UPDATE
+from stories.check_game_state import CheckGameState
+from stories.choose_event import ChooseEventAction
+from stories.error_message import ConnectionErrorMessage
+from stories.join_server import JoinServer
+from stories.ready import SetReadyStatus
+from stories.subscribe_to_depths import SubscribeToDepths
+from stories.take_action import TakeManagementAction
+
+# called with the route, the seconds until the answer arrived and the error, if any
+RequestObserver = Callable[[str, float, Optional[str]], None]
+
+
+class HeadlessUi(EBC):
+    """Stands in for the menu a story is usually created from, and collects the events that a menu would show"""
+
+    def __init__(self, client: 'HeadlessClient', depth: int = 0):
+        self.client = client
+        self.depth = depth
+        self.events: List[GameEvent] = []
+
+    def handle_game_event(self, e: GameEvent):
+        self.events.append(e)
+
+
+class HeadlessClient(EBC):
+    """
+    Plays as one user on one server. Provides what stories expect from `Story.client()`.
+    The local state follows the state updates that the server pushes, see `state`.
+    Failed requests raise a ConnectionErrorMessage.
+    Many clients can run in the same process, each has its own websocket and network thread.
+    """
+
+    def __init__(self, host: str, request_observer: Optional[RequestObserver] = None):
+        self.host = host
+        self.request_observer = request_observer
+        self.local_gamestate: Optional[AppLocalGameState] = None
+        self.lock = threading.RLock()  # protects the local state against the network thread applying push messages
+        self.stale = False  # a push message was missed, the next call of `state` asks the server
+        self.last_state_update = time.perf_counter()
+        self.unchanged_polls = 0
+        self.server_connection = ServerConnection(push_message_handler=self.handle_push_message,
+                                                  reconnect_handler=self.mark_stale)
+        self.ui = HeadlessUi(self)
+
+    # what stories expect from the client
+
+    def server_request(self, host: str, route: str, data: JSONInfo) -> JSONInfo:
+        start = time.perf_counter()
+        try:
+            response = self.server_connection.server_request(host, route, data)
+        except ConnectionErrorMessage as e:
+            self.observe(route, start, e.title)
+            raise
+        except Exception as e:
+            self.observe(route, start, type(e).__name__)
+            raise
+        self.observe(route, start)
+        return response
+
+    def observe(self, route: str, start: float, error: Optional[str] = None):
+        if self.request_observer is not None:
+            self.request_observer(route, time.perf_counter() - start, error)
+
+    def send_messages(self, messages):
+        pass  # meant for message boxes
+
+    def after_state_update(self):
+        pass
+
+    def handle_push_message(self, message_type: MessageType, contents: Message):
+        # called on the network thread
+        if message_type != GAME_STATE_UPDATE:
+            return
+        with self.lock:
+            if self.local_gamestate is None or contents['version'] <= self.local_gamestate.version():
+                return
+            if not self.local_gamestate.apply_state_diff(**contents):
+                self.stale = True
+
+    def mark_stale(self):
+        self.stale = True
+
+    # the actual interface
+
+    def join(self, username: UserName) -> AppGameState:
+        """Signs in, creating the user if needed, and downloads the game state"""
+        response = JoinServer(self.ui).to_server({'username': username})
+        user = AppUser(username=username, session_id=response['session_id'])
+        gs = AppGameState(game_name=response['game_name'])
+        gs.new_user(user, initialize=False)
+        with self.lock:
+            self.local_gamestate = AppLocalGameState(gs, main_user_name=username)
+        return self.state(refresh=True)
+
+    def state(self, refresh=False) -> AppGameState:
+        """The local game state. Asks the server for changes only if `refresh` or if a push message was missed."""
+        if refresh or self.stale or self.local_gamestate.state_json is None:
+            self.update_state(CheckGameState(self.ui))
+        return self.local_gamestate.game_state
+
+    def subscribe(self, depths: Optional[List[int]]) -> AppGameState:
+        """Receive the details of the games at these depths only, `None` for all depths"""
+        self.update_state(SubscribeToDepths(self.ui, depths))
+        return self.local_gamestate.game_state
+
+    def update_state(self, story: CheckGameState):
+        self.stale = False
+        with self.lock:
+            request = story.state_request()
+        response = story.to_server(request)
+        with self.lock:
+            if self.apply_state_response(story, response):
+                return
+        response = story.to_server(story.state_request(full=True))
+        with self.lock:
+            self.apply_state_response(story, response)
+
+    def apply_state_response(self, story: CheckGameState, response: JSONInfo) -> bool:
+        if response.get('not_modified'):
+            self.server_connection.set_push_stream_position(**response['push_stream'])
+            return True
+        return story.apply_response(response)
+
+    def game(self, depth=0) -> Optional[ESportsGame]:
+        return self.local_gamestate.game_state.game_at_depth(depth)
+
+    def player(self, depth=0) -> Optional[ESportsPlayer]:
+        game = self.game(depth)
+        if game is None:
+            return None
+        return game.player_controlled_by(self.local_gamestate.main_user_name)
+
+    def take_action(self, action_name: str, depth=0) -> List[GameEvent]:
+        """The events the action caused, they are already applied to the local state"""
+        ui = HeadlessUi(self, depth)
+        story = TakeManagementAction(ui, action_name)
+        response = story.to_server({'action_name': action_name, 'depth': depth})
+        with self.lock:
+            story.handle_response(response)
+        return ui.events
+
+    def choose(self, choice: ManagerChoice, option: GameEvent, depth=0) -> List[GameEvent]:
+        """Answers a pending choice of the player with one of `choice.choices`"""
+        ui = HeadlessUi(self, depth)
+        story = ChooseEventAction(ui, choice_title=choice.title, choice=option)
+        response = story.to_server({'choice_title': choice.title, 'choice_description': option.text_description(), 'depth': depth})
+        with self.lock:
+            story.handle_response(response)
+        return ui.events
+
+    def set_ready(self, ready: bool, wait_for: Optional[WaitingCondition] = None, depth=0) -> JSONInfo:
+        """By default waits for the end of the next match"""
+        if wait_for is None:
+            wait_for = self.game(depth).condition_to_wait_for_next_end_of_match()
+        return SetReadyStatus(HeadlessUi(self, depth)).to_server({'ready': ready, 'wait_for': wait_for.to_json(), 'depth': depth})
+
+    def close(self):
+        self.server_connection.close()
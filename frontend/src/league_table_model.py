@@ -0,0 +1,54 @@
+from typing import List
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt, QModelIndex
+
+from data.league_table import LEAGUE_TABLE_COLUMNS, LeagueTableRow, changed_row_ranges
+
+
+class LeagueTableModel(QtCore.QAbstractTableModel):
+    """
+    Holds the displayed text of the league table.
+    `set_rows` only notifies the view about rows that changed, instead of recreating every cell.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows: List[LeagueTableRow] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(LEAGUE_TABLE_COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.rows[index.row()][index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        return LEAGUE_TABLE_COLUMNS[section]
+
+    def set_rows(self, rows: List[LeagueTableRow]):
+        old_count = len(self.rows)
+        new_count = len(rows)
+        if new_count < old_count:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            del self.rows[new_count:]
+            self.endRemoveRows()
+        ranges = changed_row_ranges(self.rows, rows)
+        self.rows[:len(self.rows)] = rows[:len(self.rows)]
+        last_column = len(LEAGUE_TABLE_COLUMNS) - 1
+        for first, last in ranges:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column), [Qt.DisplayRole])
+        if new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self.rows.extend(rows[old_count:])
+            self.endInsertRows()
@@ -1,17 +1,16 @@
 import functools
-import math
 import typing
 
-from PyQt5 import QtWidgets
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import QListWidgetItem
 
 from data.app_gamestate import AppGameState
 from data.custom_trueskill import CustomTrueSkill
-from data.esports_player import ESportsPlayer
 from data.game_event_base import GameEvent
 from data.manager_choice import ManagerChoice
 from frontend.event_dialog import ChoiceEventDialog
 from frontend.generated.manager_menu import Ui_ManagerWindow
+from frontend.src.league_table_model import LeagueTableModel
 from stories.choose_event import ChooseEventAction
 from stories.take_action import TakeManagementAction
 
@@ -26,12 +25,18 @@ class ManagerMenu(Ui_ManagerWindow):
         self.depth = depth
         self.closed = False
         self.dialogs: typing.List[ChoiceEventDialog] = []
+        self.league_table_model = LeagueTableModel()
+        self.shown_revision: typing.Optional[int] = None  # of the game at this depth, see AppClient.update_windows
 
     def closeEvent(self, _event):
         self.closed = True
 
     def setupUi(self, MainWindow):
         super().setupUi(MainWindow)
+        league_table_proxy = QtCore.QSortFilterProxyModel(self.leagueTableView)
+        league_table_proxy.setSourceModel(self.league_table_model)
+        self.leagueTableView.setModel(league_table_proxy)
+        self.leagueTableView.sortByColumn(0, QtCore.Qt.AscendingOrder)
         self.stopMicroManageButton.setVisible(self.depth > 0)
         self.startMatchButton.clicked.connect(self.user_ready_for_next_tournament_game)
         self.stopMicroManageButton.clicked.connect(self.stop_micro_manage)
@@ -124,31 +129,21 @@ class ManagerMenu(Ui_ManagerWindow):
             print('Game ended, closing manager window')
             self.try_close()
             return
-        players: typing.List[ESportsPlayer] = list(game.players.values())
-        players = sorted(players, key=ESportsPlayer.rank_sorting_key)
-        self.leagueTableWidget.setRowCount(len(players))
         my_player = self.my_player()
+        game_view = self.client.local_gamestate.view_model().game_at_depth(self.depth)
         self.playerNameLabel.setText(my_player.name)
-        for row_idx, player in enumerate(players):
-            place_string = '#' + str(row_idx + 1)
-            add_leading_spaces = math.ceil(math.log(len(players), 10)) - len(str(row_idx + 1))
-            place_string = ' ' * add_leading_spaces + place_string
-            self.leagueTableWidget.setItem(row_idx, 0, QtWidgets.QTableWidgetItem(place_string))
-            self.leagueTableWidget.setItem(row_idx, 1, QtWidgets.QTableWidgetItem(player.tag_and_name()))
-            self.leagueTableWidget.setItem(row_idx, 2, QtWidgets.QTableWidgetItem(f'{player.average_rank:.1f}'))
-            self.leagueTableWidget.setItem(row_idx, 3, QtWidgets.QTableWidgetItem(str(round(player.tournament_elo))))
-            self.leagueTableWidget.setItem(row_idx, 4, QtWidgets.QTableWidgetItem(str(len(game.game_results))))
-            self.leagueTableWidget.setItem(row_idx, 5, QtWidgets.QTableWidgetItem(game.previous_ranks_string(n=3, player_name=player.name)))
-        self.statusWidget.clear()
-        self.statusWidget.addItem(QListWidgetItem(f'Managing {my_player.tag_and_name()}'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.days_until_next_match} days until next match'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.money:.2f} €'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.health:.0f} health'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.motivation:.0f} motivation'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.ranked_elo:.0f} ranked match rating'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.bot_match_elo:.0f} bot match performance'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.tournament_elo:.0f} tournament performance'))
-        self.statusWidget.addItem(QListWidgetItem(f'{my_player.average_rank:.1f} avg. tournament ranking'))
+        self.league_table_model.set_rows(game_view.league_table_rows)
+        self.set_status_lines([
+            f'Managing {game_view.tags_and_names[my_player.name]}',
+            f'{my_player.days_until_next_match} days until next match',
+            f'{my_player.money:.2f} €',
+            f'{my_player.health:.0f} health',
+            f'{my_player.motivation:.0f} motivation',
+            f'{my_player.ranked_elo:.0f} ranked match rating',
+            f'{my_player.bot_match_elo:.0f} bot match performance',
+            f'{my_player.tournament_elo:.0f} tournament performance',
+            f'{my_player.average_rank:.1f} avg. tournament ranking',
+        ])
 
         for dialog in self.dialogs.copy():
             if not any(choice == dialog.event_
@@ -156,6 +151,17 @@ class ManagerMenu(Ui_ManagerWindow):
                 dialog.close()
                 self.dialogs.remove(dialog)
 
+    def set_status_lines(self, lines: typing.List[str]):
+        """Changes the text of the existing items instead of recreating them"""
+        while self.statusWidget.count() > len(lines):
+            self.statusWidget.takeItem(self.statusWidget.count() - 1)
+        for row_idx, line in enumerate(lines):
+            item = self.statusWidget.item(row_idx)
+            if item is None:
+                self.statusWidget.addItem(QListWidgetItem(line))
+            elif item.text() != line:
+                item.setText(line)
+
     def send_choice(self, choice_title: str, choice: GameEvent):
         with self.client.handling_errors():
             ChooseEventAction(self, choice_title=choice_title, choice=choice)()
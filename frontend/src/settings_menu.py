@@ -1,3 +1,5 @@
+from typing import Optional
+
 import frontend.app_client
 from data.app_gamestate import AppGameState
 from frontend.generated.settings_menu import Ui_SettingsWindow
@@ -8,6 +10,7 @@ class SettingsMenu(Ui_SettingsWindow):
         super().__init__()
         self.client = client
         self.closed = False
+        self.shown_revision: Optional[int] = None
 
     def closeEvent(self, _event):
         self.closed = True
@@ -26,6 +26,7 @@ class WaitingMenu(Ui_WaitingWindow):
         self.depth = depth
         self.wait_for = wait_for
         self.closed = False
+        self.shown_revision: typing.Optional[int] = None  # of the game at this depth, see AppClient.update_windows
 
     def game(self):
         return self.client.local_gamestate.game_state.game_at_depth(self.depth)
@@ -92,7 +93,7 @@ class WaitingMenu(Ui_WaitingWindow):
                     print(f'Re-opening manager window at d={self.depth}')
                     self.client.open_manager_window(depth=self.depth)
                 self.closed = True
-                self.client.manager_menus[-1].information(title=f'Match {match_idx} ended', msg=game.match_summary(match_idx, focus_on_player=self.my_player().name))
+                self.client.manager_menus[-1].information(title=f'Match {match_idx} ended', msg=self.client.local_gamestate.view_model().game_at_depth(self.depth).match_summary(match_idx, focus_on_player=self.my_player().name))
         if self.closed:
             self.try_close()
             return
@@ -0,0 +1,51 @@
+import json
+import os
+import re
+from typing import Optional, List
+
+from network.my_types import JSONInfo, UserName
+
+STATE_CACHE_DIRECTORY = 'client_cache'
+
+
+class StateCache:
+    """
+    Keeps the last game state a client received from a server on disk, one file per server, game and user.
+    After reconnecting, the client can show the cached state right away and ask the server for the changes since its version.
+    The version is only compared within the epoch stored with the state, see `GameState.epoch`.
+    """
+
+    def __init__(self, directory=STATE_CACHE_DIRECTORY):
+        self.directory = directory
+
+    def file_name(self, host: str, game_name: str, username: UserName) -> str:
+        name = re.sub(r'[^\w.-]', '_', f'{host}_{game_name}_{username}')
+        return os.path.join(self.directory, name + '.json')
+
+    def save(self, host: str, game_name: str, username: UserName, state_json: JSONInfo, depths: Optional[List[int]]):
+        # session ids change with every login and must not override the current one
+        users = [{k: v for k, v in user.items() if k != 'session_id'} for user in state_json.get('users', [])]
+        file_name = self.file_name(host, game_name, username)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_file_name = file_name + '.tmp'
+        with open(tmp_file_name, 'w') as cache_file:
+            json.dump({'state_json': {**state_json, 'users': users}, 'depths': depths}, cache_file)
+        os.replace(tmp_file_name, file_name)
+
+    def load(self, host: str, game_name: str, username: UserName) -> Optional[JSONInfo]:
+        """The state and the depths it contains the details of, or None if nothing usable was cached"""
+        file_name = self.file_name(host, game_name, username)
+        if not os.path.isfile(file_name):
+            return None
+        try:
+            with open(file_name, 'r') as cache_file:
+                cached = json.load(cache_file)
+            if any(key not in cached['state_json'] for key in ['version', 'epoch', 'game']):
+                return None
+            return cached
+        except (OSError, ValueError, KeyError, TypeError):
+            print('Ignoring unreadable cache file', file_name)
+            return None
+
+
+state_cache = StateCache()
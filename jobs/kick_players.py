@@ -7,11 +7,11 @@ from data.esports_game import ESportsGame
 
 def kick_users(save_path: str, usernames: List[str]):
     state = AppGameState.load(save_path)
-    state.users = [
-        user for user in state.users
-        if user.username not in usernames
-    ]
+    for username in usernames:
+        if state.user_name_exists(username):
+            state.remove_user(username)
     remove_control_from_game(state.game, usernames)
+    state.start_new_epoch()  # the version stays the same, so clients must not reuse states they cached before
     state.commit()
 
 
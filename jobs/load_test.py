@@ -0,0 +1,138 @@
+"""
+Measures the capacity of a running server by letting simulated managers play against it.
+Example: start `python -m run_server loadtest` and then run `python -m jobs.load_test --managers 32 --duration 60`.
+The managers are headless clients, see frontend.headless_client.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy
+
+from data.event_sampler import EventSampler
+from frontend.headless_client import HeadlessClient
+from lib.util import EBC
+from network import connection
+from network.my_types import JSONInfo
+from stories.error_message import ConnectionErrorMessage
+
+ACTION_NAMES = [sampler.action_name for sampler in EventSampler().samplers()]
+
+
+class LoadTestStatistics(EBC):
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, error: Optional[str] = None):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if error is not None:
+                self.errors[route] += 1
+
+    def report(self, duration: float) -> JSONInfo:
+        with self.lock:
+            routes = {route: self.route_report(latencies, self.errors[route], duration)
+                      for route, latencies in sorted(self.latencies.items())}
+            all_latencies = [t for latencies in self.latencies.values() for t in latencies]
+            return {
+                'duration': duration,
+                **self.route_report(all_latencies, sum(self.errors.values()), duration),
+                'routes': routes,
+            }
+
+    @staticmethod
+    def route_report(latencies: List[float], errors: int, duration: float) -> JSONInfo:
+        if len(latencies) == 0:
+            return {'requests': 0, 'errors': errors}
+        p50, p90, p99 = numpy.percentile(latencies, [50, 90, 99]).tolist()
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': errors / len(latencies),
+            'throughput': len(latencies) / duration,
+            'latency_mean': float(numpy.mean(latencies)),
+            'latency_p50': p50,
+            'latency_p90': p90,
+            'latency_p99': p99,
+            'latency_max': max(latencies),
+        }
+
+
+class SimulatedManager(EBC):
+    """Manages one player at depth 0: takes actions until the next tournament match, answers pending choices and then gets ready."""
+
+    def __init__(self, username: str, host: str, statistics: LoadTestStatistics, think_time: float):
+        self.username = username
+        self.think_time = think_time
+        self.client = HeadlessClient(host, request_observer=statistics.record)
+
+    def step(self):
+        self.client.state(refresh=True)
+        game = self.client.game(0)
+        player = self.client.player(0)
+        if player.pending_choices:
+            choice = random.choice(player.pending_choices)
+            self.client.choose(choice, random.choice(choice.choices))
+        elif game.ongoing_match is None and player.days_until_next_match > 0:
+            self.client.take_action(random.choice(ACTION_NAMES))
+        elif player.name not in game.ready_players:
+            self.client.set_ready(True)
+        # otherwise wait for the other managers to get ready
+
+    def run(self, deadline: float):
+        try:
+            self.client.join(self.username)
+            while time.perf_counter() < deadline:
+                try:
+                    self.step()
+                except ConnectionErrorMessage:
+                    pass  # already counted in the statistics
+                time.sleep(random.expovariate(1 / self.think_time))
+        finally:
+            self.client.close()
+
+
+def run_load_test(num_managers: int, duration: float, host: str, think_time: float) -> JSONInfo:
+    statistics = LoadTestStatistics()
+    run_id = random.randint(0, 999)
+    managers = [SimulatedManager(f'Load Test{run_id} Bot{idx}', host, statistics, think_time)
+                for idx in range(num_managers)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_managers) as executor:
+        for future in [executor.submit(m.run, start + duration) for m in managers]:
+            future.result()
+    report = statistics.report(time.perf_counter() - start)
+    report['managers'] = num_managers
+    report['think_time'] = think_time
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate managers playing on a running server and report throughput, latency and errors as JSON.')
+    parser.add_argument('--managers', type=int, default=16, help='number of simulated managers, at most one per player in the tournament')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=connection.PORT)
+    parser.add_argument('--think-time', type=float, default=0.5, help='mean seconds between two actions of a manager')
+    parser.add_argument('--output', default=None, help='file to write the JSON report to, in addition to stdout')
+    args = parser.parse_args()
+    report = run_load_test(num_managers=args.managers,
+                           duration=args.duration,
+                           host=f'http://{args.host}:{args.port}',
+                           think_time=args.think_time)
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(report_json)
+
+
+if __name__ == '__main__':
+    main()
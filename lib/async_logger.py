@@ -0,0 +1,106 @@
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Dict, Optional, List, Tuple, Any
+
+LogRecord = Tuple[float, int, str, Dict[str, Any]]
+
+
+class AsyncLogger:
+    """
+    Structured logging that does not block the caller:
+    records are put into a queue and formatted and written by a background thread.
+    High-volume events can be sampled, records at level WARNING and above are never sampled away.
+    Optionally, records are also stored in a SQLite `lib.db_log.DBLog`, using one insert per batch.
+    """
+
+    def __init__(self,
+                 sample_rates: Optional[Dict[str, float]] = None,
+                 db_name: Optional[str] = None,
+                 max_queue_size=10000,
+                 batch_size=100,
+                 print_records=True):
+        self.sample_rates = sample_rates if sample_rates is not None else {}
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.print_records = print_records
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped_records = 0
+        self.thread: Optional[threading.Thread] = None
+        self.start_lock = threading.Lock()
+
+    def log(self, event: str, level=logging.INFO, **fields):
+        if level < logging.WARNING and random.random() >= self.sample_rates.get(event, 1.):
+            return
+        if self.thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait((time.time(), level, event, fields))
+        except queue.Full:
+            self.dropped_records += 1
+
+    def error(self, event: str, **fields):
+        self.log(event, level=logging.ERROR, **fields)
+
+    def _start(self):
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._write_forever, name='AsyncLogger', daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def close(self, timeout=5.):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=timeout)
+
+    def _write_forever(self):
+        db_log = None
+        if self.db_name is not None:
+            from lib.db_log import DBLog
+            db_log = DBLog(self.db_name)
+        while True:
+            batch: List[LogRecord] = []
+            record = self.queue.get()
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._write(batch, db_log)
+            if record is None:
+                if db_log is not None:
+                    db_log.disconnect(rollback=False)
+                return
+
+    def _write(self, batch: List[LogRecord], db_log):
+        if self.print_records:
+            for record in batch:
+                print(self.format_record(record))
+        if db_log is not None and len(batch) > 0:
+            entries = []
+            for record in batch:
+                timestamp, level, event, fields = record
+                entries.append((self.format_record(record), event, level, json.dumps(fields, default=str), round(timestamp)))
+            db_log.log_many(entries)
+            db_log.connection.commit()
+
+    @staticmethod
+    def format_record(record: LogRecord) -> str:
+        timestamp, level, event, fields = record
+        formatted_time = datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        formatted_fields = ' '.join(f'{k}={v:.4f}' if isinstance(v, float) else f'{k}={v}'
+                                    for k, v in fields.items())
+        if level >= logging.WARNING:
+            event = f'{logging.getLevelName(level)} {event}'
+        return f'{formatted_time} {event} {formatted_fields}'
@@ -101,6 +101,23 @@ class DBLog:
         VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (message, data, dt_created, current_pid, current_head_hex_sha, message_type, level))
 
+    def log_many(self,
+                 entries,
+                 current_pid=None,
+                 current_head_hex_sha=CURRENT_SHA):
+        """
+        Inserts many entries with a single statement.
+        Each entry is a tuple (message, message_type, level, data, dt_created).
+        """
+        if current_pid is None:
+            current_pid = os.getpid()
+        self.cursor.executemany('''
+        INSERT INTO entries(message, data, dt_created, pid, head_hex_sha, message_type, level)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(message, data, dt_created, current_pid, current_head_hex_sha, message_type, level)
+              for message, message_type, level, data, dt_created in entries
+              if level >= self.min_level])
+
     def debug(self, message, *args, **kwargs):
         self.log(message, logging.DEBUG, *args, **kwargs)
 
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Union
+
+JSONPath = List[Union[str, int]]
+JSONDiffOp = Dict[str, Any]  # {'op': 'set', 'path': [...], 'value': ...} or {'op': 'del', 'path': [...]}
+
+
+def json_diff(old: Any, new: Any, path: JSONPath = None) -> List[JSONDiffOp]:
+    """
+    Operations that turn the JSON document `old` into `new` when applied with `apply_json_diff`.
+    Dicts are compared key by key, lists element by element if they did not shrink (appended elements are set at the end).
+    Anything else that differs is replaced as a whole.
+    """
+    if path is None:
+        path = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for k in old:
+            if k not in new:
+                ops.append({'op': 'del', 'path': path + [k]})
+        for k, v in new.items():
+            if k not in old:
+                ops.append({'op': 'set', 'path': path + [k], 'value': v})
+            else:
+                ops.extend(json_diff(old[k], v, path + [k]))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old):
+        ops = []
+        for idx, (old_value, new_value) in enumerate(zip(old, new)):
+            ops.extend(json_diff(old_value, new_value, path + [idx]))
+        for idx in range(len(old), len(new)):
+            ops.append({'op': 'set', 'path': path + [idx], 'value': new[idx]})
+        return ops
+    if type(old) == type(new) and old == new:
+        return []
+    return [{'op': 'set', 'path': path, 'value': new}]
+
+
+def apply_json_diff(doc: Any, ops: List[JSONDiffOp]) -> Any:
+    """Applies the operations in place (where possible) and returns the resulting document. Values are inserted without copying."""
+    for op in ops:
+        path = op['path']
+        if len(path) == 0:
+            if op['op'] == 'set':
+                doc = op['value']
+            else:
+                doc = None
+            continue
+        parent = doc
+        for key in path[:-1]:
+            parent = parent[key]
+        key = path[-1]
+        if op['op'] == 'set':
+            if isinstance(parent, list) and key == len(parent):
+                parent.append(op['value'])
+            else:
+                parent[key] = op['value']
+        elif op['op'] == 'del':
+            del parent[key]
+        else:
+            raise ValueError(op['op'])
+    return doc
+
+
+def apply_json_diff_to_copy(doc: Any, ops: List[JSONDiffOp]) -> Any:
+    """
+    Like `apply_json_diff`, but leaves `doc` unchanged, also if an operation does not fit it and raises an error.
+    Only the dicts and lists along the changed paths are copied, everything else is shared with `doc`.
+    """
+    root = [doc]
+    copies = set()  # ids of the containers that were already copied
+    for op in ops:
+        path = op['path']
+        parent = root
+        key = 0
+        for next_key in path:
+            child = parent[key]
+            if id(child) not in copies:
+                if isinstance(child, dict):
+                    child = dict(child)
+                elif isinstance(child, list):
+                    child = list(child)
+                else:
+                    raise TypeError(f'Cannot apply {op} below a {type(child).__name__}')
+                copies.add(id(child))
+                parent[key] = child
+            parent = child
+            key = next_key
+        if op['op'] == 'set':
+            if isinstance(parent, list) and key == len(parent):
+                parent.append(op['value'])
+            else:
+                parent[key] = op['value']
+        elif op['op'] == 'del':
+            del parent[key]
+        else:
+            raise ValueError(op['op'])
+    return root[0]
+
+
+def compact_json_diff(ops: List[JSONDiffOp]) -> List[JSONDiffOp]:
+    """
+    Drops operations that are overwritten by a later operation, for example when several diffs are concatenated.
+    An operation is obsolete if a later operation sets the same path or sets or deletes one of its ancestors.
+    Operations on a list index are only dropped together with an ancestor, since they may append to or shrink the list
+    and so change which indices the operations in between refer to.
+    Applying the result has the same effect as applying `ops`.
+    """
+    overwritten_paths = set()  # later 'set' operations replace everything at and below these paths
+    removed_ancestors = set()  # later operations replace everything strictly below these paths
+    result = []
+    for op in reversed(ops):
+        path = tuple(op['path'])
+        changes_list_length = len(path) > 0 and isinstance(path[-1], int)
+        if path in overwritten_paths and not changes_list_length:
+            continue
+        if any(path[:idx] in removed_ancestors for idx in range(len(path))):
+            continue
+        result.append(op)
+        if op['op'] == 'set':
+            overwritten_paths.add(path)
+        removed_ancestors.add(path)
+    result.reverse()
+    return result
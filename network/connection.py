@@ -1,19 +1,236 @@
-import datetime
 import json
-from typing import Dict, List
-
+import time
+from collections import deque
+from typing import Dict, List, Optional, Callable, Tuple, Set, Deque, Iterable
+from uuid import uuid4
+
+import cachetools
+import gevent
+import gevent.pool
 import requests
 from geventwebsocket import WebSocketError
 from geventwebsocket.websocket import WebSocket
 
-from network.my_types import MessageType, Message, UserName, MessageQueue
+from data import server_gamestate
+from network.my_types import MessageType, Message, UserName, MessageQueue, JSONInfo
+from network.request_log import request_log
 
 PORT = 15291
 ROOT_URL = "/index.html"
+REPLAY_CACHE_SIZE = 1000
+REPLAY_CACHE_SECONDS = 120
+PUSH_CONCURRENCY = 64
+SEND_TIMEOUT_SECONDS = 5
+MAX_SEND_QUEUE_LENGTH = 100
+PUSH_REPLAY_BUFFER_SIZE = 200
+MAX_IDLE_SECONDS = 300  # clients poll at least every two minutes, see AppClient.MAX_POLLING_SECONDS
+IDLE_CHECK_SECONDS = 60
 
-websockets_for_user: Dict[UserName, List[WebSocket]] = {}
-users_for_websocket: Dict[WebSocket, List[UserName]] = {}
 push_message_queue: MessageQueue = []
+push_pool = gevent.pool.Pool(PUSH_CONCURRENCY)
+# sockets with queued messages that wait for a free greenlet in the push pool
+sockets_waiting_for_push_pool: Deque['SocketState'] = deque()
+# combine two consecutive messages of the same type for the same recipient into one, or return None if they cannot be merged
+push_message_mergers: Dict[MessageType, Callable[[Message, Message], Optional[Message]]] = {}
+
+
+class SocketState:
+    """What the registry knows about one websocket"""
+
+    def __init__(self, ws: WebSocket, now: float):
+        self.ws = ws
+        self.usernames: Set[UserName] = set()
+        self.alive = True
+        self.last_activity = now
+        # messages waiting to be sent, drained by at most one greenlet at a time so that frames do not interleave
+        self.send_queue: Deque[str] = deque()
+        self.sending = False
+
+
+class WebSocketRegistry:
+    """
+    All open websockets and the users they are authenticated as, indexed in both directions.
+    Registering, authenticating, looking up and removing a socket take constant time.
+    """
+
+    def __init__(self, timer=time.monotonic):
+        self.timer = timer
+        self.sockets: Dict[WebSocket, SocketState] = {}
+        self.sockets_for_user: Dict[UserName, Set[WebSocket]] = {}
+
+    def __len__(self):
+        return len(self.sockets)
+
+    def __contains__(self, ws: WebSocket):
+        return ws in self.sockets
+
+    def register(self, ws: WebSocket) -> SocketState:
+        if ws not in self.sockets:
+            self.sockets[ws] = SocketState(ws, self.timer())
+        return self.sockets[ws]
+
+    def state(self, ws: WebSocket) -> Optional[SocketState]:
+        return self.sockets.get(ws)
+
+    def add_user(self, ws: WebSocket, username: UserName):
+        self.register(ws).usernames.add(username)
+        self.sockets_for_user.setdefault(username, set()).add(ws)
+
+    def remove_user(self, ws: WebSocket, username: UserName):
+        state = self.sockets.get(ws)
+        if state is not None:
+            state.usernames.discard(username)
+        sockets = self.sockets_for_user.get(username)
+        if sockets is not None:
+            sockets.discard(ws)
+            if len(sockets) == 0:
+                del self.sockets_for_user[username]
+
+    def unregister(self, ws: WebSocket) -> Optional[SocketState]:
+        state = self.sockets.pop(ws, None)
+        if state is None:
+            return None
+        state.alive = False
+        state.send_queue.clear()
+        for username in state.usernames:
+            sockets = self.sockets_for_user[username]
+            sockets.discard(ws)
+            if len(sockets) == 0:
+                del self.sockets_for_user[username]
+        return state
+
+    def sockets_of_user(self, username: UserName) -> Set[WebSocket]:
+        return self.sockets_for_user.get(username, set())
+
+    def sockets_of_users(self, usernames: Iterable[UserName]) -> Set[WebSocket]:
+        return {ws for username in usernames for ws in self.sockets_for_user.get(username, ())}
+
+    def touch(self, ws: WebSocket):
+        state = self.sockets.get(ws)
+        if state is not None:
+            state.last_activity = self.timer()
+
+    def idle_sockets(self, max_idle_seconds: float) -> List[WebSocket]:
+        threshold = self.timer() - max_idle_seconds
+        return [ws for ws, state in self.sockets.items() if state.last_activity < threshold]
+
+
+websockets = WebSocketRegistry()
+
+
+class WebSocketConnection:
+    """
+    A websocket connection and the session it is authenticated with.
+    The session is bound when the socket first authenticates, instead of being looked up for every message.
+    It is only bound again when a message carries a different session.
+    """
+
+    def __init__(self, ws: WebSocket):
+        self.ws = ws
+        self.session_id: Optional[str] = None
+        self.username: Optional[UserName] = None
+        websockets.register(ws)
+
+    def authenticated(self):
+        return self.session_id is not None
+
+    def authenticate(self, session_id: str) -> bool:
+        user = server_gamestate.gs.user_by_session_id(session_id)
+        if user is None:
+            return False
+        if self.username is not None and self.username != user.username:
+            websockets.remove_user(self.ws, self.username)
+        self.session_id = session_id
+        self.username = user.username
+        websockets.add_user(self.ws, user.username)
+        return True
+
+    def authenticate_request(self, session_id: Optional[str]):
+        """
+        Called for every message. A request that carries a different session than the bound one re-binds the connection,
+        so that it never runs as the previously bound user, and a rotated session can be replaced without a new JoinServer.
+        """
+        if session_id is None or session_id == self.session_id:
+            return
+        if not self.authenticate(session_id):
+            self.unbind()
+
+    def unbind(self):
+        if self.username is not None:
+            websockets.remove_user(self.ws, self.username)
+        self.session_id = None
+        self.username = None
+
+    def user(self):
+        """The user the connection is authenticated as, or None if the session has expired in the meantime"""
+        if self.session_id is None:
+            return None
+        return server_gamestate.gs.user_by_session_id(self.session_id)
+
+
+# the connection the currently processed request came from, None for plain HTTP requests
+current_connection: Optional[WebSocketConnection] = None
+
+
+class ReplayCache:
+    """
+    Remembers the responses to state-changing requests by their request_token for a limited time.
+    If a client retries a request after its connection dropped, it gets the original response
+    instead of the request being executed a second time.
+    """
+
+    def __init__(self, maxsize=REPLAY_CACHE_SIZE, ttl=REPLAY_CACHE_SECONDS, timer=time.monotonic):
+        self.responses = cachetools.TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+
+    def get(self, username: Optional[UserName], route: str, request_token: str) -> Optional[JSONInfo]:
+        return self.responses.get((username, route, request_token))
+
+    def put(self, username: Optional[UserName], route: str, request_token: str, response: JSONInfo):
+        self.responses[(username, route, request_token)] = response
+
+
+replay_cache = ReplayCache()
+
+
+class PushStream:
+    """
+    Numbers the push messages and remembers the most recent ones of every user,
+    so that a client that reconnects can get the messages it missed instead of the full game state.
+    The sequence numbers are shared by all users, so that a message is still encoded once for all recipients.
+    They increase for every user, but with gaps.
+    """
+
+    def __init__(self, buffer_size=PUSH_REPLAY_BUFFER_SIZE):
+        self.stream_id = uuid4().hex  # changes when the server restarts, old sequence numbers are meaningless then
+        self.last_seq = 0
+        self.buffer_size = buffer_size
+        self.messages_for_user: Dict[UserName, Deque[Tuple[int, str]]] = {}
+        self.evicted_seq: Dict[UserName, int] = {}  # the highest sequence number that no longer is in a users buffer
+
+    def next_seq(self) -> int:
+        self.last_seq += 1
+        return self.last_seq
+
+    def position(self) -> JSONInfo:
+        return {'stream_id': self.stream_id, 'seq': self.last_seq}
+
+    def record(self, usernames: Iterable[UserName], seq: int, message: str):
+        for username in usernames:
+            buffer = self.messages_for_user.setdefault(username, deque())
+            if len(buffer) >= self.buffer_size:
+                self.evicted_seq[username] = buffer.popleft()[0]
+            buffer.append((seq, message))
+
+    def missed_messages(self, username: UserName, stream_id: str, last_seq: int) -> Optional[List[str]]:
+        """The encoded messages after `last_seq` in order, or None if some of them are not available anymore"""
+        if stream_id != self.stream_id or last_seq > self.last_seq:
+            return None
+        if self.evicted_seq.get(username, 0) > last_seq:
+            return None
+        return [message for seq, message in self.messages_for_user.get(username, ()) if seq > last_seq]
+
+
+push_stream = PushStream()
 
 
 def not_found(msg=''):
@@ -65,25 +282,70 @@ def json_request(url, data):
     return r.json()
 
 
+def send(ws: WebSocket, message: str) -> bool:
+    """
+    Queues a message to be sent over the websocket by the push pool and returns immediately.
+    Returns False if the socket is already closed or too far behind, in which case it is cleaned up.
+    """
+    state = websockets.state(ws)
+    if state is None or ws.closed:
+        ws_cleanup(ws)
+        return False
+    if len(state.send_queue) >= MAX_SEND_QUEUE_LENGTH:
+        request_log.error('send_failed', client_address=ws.handler.client_address, reason='send queue full')
+        ws_cleanup(ws)
+        return False
+    state.send_queue.append(message)
+    if not state.sending:
+        state.sending = True
+        # never wait for a free greenlet here, this runs under the request lock
+        if push_pool.full():
+            sockets_waiting_for_push_pool.append(state)
+        else:
+            push_pool.spawn(_drain_send_queues, state)
+    return True
+
+
+def _drain_send_queues(state: SocketState):
+    """Sends the messages of this socket, then of the sockets that wait for a free greenlet"""
+    while True:
+        _drain_send_queue(state)
+        if len(sockets_waiting_for_push_pool) == 0:
+            return
+        state = sockets_waiting_for_push_pool.popleft()
+
+
+def _drain_send_queue(state: SocketState):
+    ws = state.ws
+    try:
+        while len(state.send_queue) > 0 and state.alive:
+            message = state.send_queue.popleft()
+            with gevent.Timeout(SEND_TIMEOUT_SECONDS):
+                ws.send(message)
+            websockets.touch(ws)
+    except (gevent.Timeout, WebSocketError, ConnectionResetError, BrokenPipeError) as e:
+        request_log.error('send_failed', client_address=ws.handler.client_address, reason=type(e).__name__)
+        ws_cleanup(ws)
+    finally:
+        state.sending = False
+
+
 def push_message(recipient_ids: List[UserName], contents: Message, message_type: MessageType):
+    """
+    Encodes the message once, records it in the push stream and queues it for all sockets of the recipients.
+    The push pool sends to them concurrently, so a slow client does not hold up the request lock or the other recipients.
+    """
     from network.routes import push_message_types
     if message_type not in push_message_types:
         raise AssertionError('Invalid message type.')
-    sockets = {socket for user_id in recipient_ids for socket in websockets_for_user.get(user_id, [])}
+    seq = push_stream.next_seq()
+    message = json.dumps({'message_type': message_type, 'contents': contents, 'stream_id': push_stream.stream_id, 'seq': seq})
+    push_stream.record(recipient_ids, seq, message)
+    sockets = websockets.sockets_of_users(recipient_ids)
+    for ws in sockets:
+        send(ws, message)
     if len(sockets) > 0:
-        message = {'message_type': message_type, 'contents': contents}
-        for ws in sockets:
-            if ws.closed:
-                ws_cleanup(ws)
-                continue
-            message = json.dumps({'message_type': message_type, 'contents': contents})
-            ws.send(message)
-        print(message_type,
-              'to',
-              len(sockets),
-              'sockets',
-              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-              len(message))
+        request_log.log('push_message', message_type=message_type, sockets=len(sockets), size=len(message))
 
 
 def enqueue_push_message(recipient_ids: List[UserName], contents: Dict, message_type: str):
@@ -97,22 +359,67 @@ def enqueue_push_message(recipient_ids: List[UserName], contents: Dict, message_
 
 
 def ws_cleanup(ws):
-    if ws in users_for_websocket:
-        users_affected = users_for_websocket[ws]
-        for user_id in users_affected:
-            # remove the websocket from all lists
-            websockets_for_user[user_id][:] = filter(lambda s: s != ws,
-                                                     websockets_for_user[user_id])
-        del users_for_websocket[ws]
-        if not ws.closed:
-            ws.close()
-    print('websocket connection ended',
-          *ws.handler.client_address,
-          datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), )
+    if websockets.unregister(ws) is not None and not ws.closed:
+        ws.close()
+    request_log.log('websocket_connection_ended', client_address=ws.handler.client_address)
+
+
+def close_idle_sockets(max_idle_seconds: float = MAX_IDLE_SECONDS) -> int:
+    """Closes sockets that neither received nor sent anything for a while, for example of clients that vanished without closing them"""
+    idle_sockets = websockets.idle_sockets(max_idle_seconds)
+    for ws in idle_sockets:
+        request_log.log('closing_idle_socket', client_address=ws.handler.client_address)
+        ws_cleanup(ws)
+    return len(idle_sockets)
+
+
+def reap_idle_sockets():
+    while True:
+        gevent.sleep(IDLE_CHECK_SECONDS)
+        close_idle_sockets()
 
 
 def preprocess_push_message_queue(queue: MessageQueue) -> MessageQueue:
-    return queue
+    """
+    Coalesces the queue so that every recipient gets at most one frame per run of consecutive messages of the same type.
+    Messages are merged with the functions in `push_message_mergers`, types without a merger are left alone.
+    Each recipient still receives its messages in the order they were enqueued.
+    Recipients that got the same messages share the merged message, so it is encoded only once.
+    """
+    messages_for_user: Dict[UserName, List[int]] = {}
+    for idx, (recipient_ids, _, _) in enumerate(queue):
+        for user_id in recipient_ids:
+            indices = messages_for_user.setdefault(user_id, [])
+            if idx not in indices[-1:]:
+                indices.append(idx)
+
+    merged_messages: Dict[Tuple[int, ...], Message] = {}
+    recipients: Dict[Tuple[int, ...], List[UserName]] = {}
+    for user_id, indices in messages_for_user.items():
+        run = ()
+        merged = None
+        for idx in indices:
+            _, contents, message_type = queue[idx]
+            if len(run) > 0 and queue[run[-1]][2] == message_type and message_type in push_message_mergers:
+                candidate = run + (idx,)
+                if candidate not in merged_messages:
+                    merged_contents = push_message_mergers[message_type](merged, contents)
+                    if merged_contents is not None:
+                        merged_messages[candidate] = merged_contents
+                if candidate in merged_messages:
+                    run = candidate
+                    merged = merged_messages[candidate]
+                    continue
+            if len(run) > 0:
+                recipients.setdefault(run, []).append(user_id)
+            run = (idx,)
+            merged = contents
+            merged_messages.setdefault(run, contents)
+        if len(run) > 0:
+            recipients.setdefault(run, []).append(user_id)
+
+    return [(user_ids, merged_messages[run], queue[run[0]][2])
+            for run, user_ids in sorted(recipients.items())]
 
 
 def push_messages_in_queue():
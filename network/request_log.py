@@ -0,0 +1,6 @@
+from config import REQUEST_LOG_DB_NAME
+from lib.async_logger import AsyncLogger
+
+# every client polls the game state every few seconds, so only a sample of those messages is logged
+request_log = AsyncLogger(sample_rates={'read_only_request': 0.1, 'websocket_message': 0.1},
+                          db_name=REQUEST_LOG_DB_NAME)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque, defaultdict
+from concurrent.futures import Future
+from typing import Dict, Optional, Deque, Any
+
+import cachetools
+import numpy
+
+from network.my_types import JSONInfo
+
+REQUEST_TIMEOUT_SECONDS = 30
+MAX_ORPHANED_RESPONSES = 100
+ORPHANED_RESPONSE_SECONDS = 60
+ROUND_TRIP_TIMES_PER_ROUTE = 200
+
+
+class PendingRequest:
+    def __init__(self, route: str, connection: Any, future: Future, sent_at: float, deadline: float):
+        self.route = route
+        self.connection = connection
+        self.future = future
+        self.sent_at = sent_at
+        self.deadline = deadline
+
+
+class RouteStatistics:
+    def __init__(self):
+        self.requests = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.connection_errors = 0
+        self.round_trip_times: Deque[float] = deque(maxlen=ROUND_TRIP_TIMES_PER_ROUTE)
+
+    def to_json(self) -> JSONInfo:
+        result = {
+            'requests': self.requests,
+            'timeouts': self.timeouts,
+            'cancelled': self.cancelled,
+            'connection_errors': self.connection_errors,
+        }
+        if len(self.round_trip_times) > 0:
+            p50, p90, p99 = numpy.percentile(self.round_trip_times, [50, 90, 99]).tolist()
+            result.update({
+                'rtt_mean': float(numpy.mean(self.round_trip_times)),
+                'rtt_p50': p50,
+                'rtt_p90': p90,
+                'rtt_p99': p99,
+                'rtt_max': max(self.round_trip_times),
+            })
+        return result
+
+
+class ResponseRouter:
+    """
+    Hands the answers that arrive over a websocket to the requests with the same request_token.
+    Requests fail with a TimeoutError once their deadline passed, `expire` needs to be called regularly to notice that.
+    Answers that nobody waits for anymore are kept for a while, in case the request is sent again with the same token.
+    Keeps round-trip times per route, see `statistics`.
+    """
+
+    def __init__(self,
+                 timeout=REQUEST_TIMEOUT_SECONDS,
+                 max_orphaned_responses=MAX_ORPHANED_RESPONSES,
+                 orphaned_response_seconds=ORPHANED_RESPONSE_SECONDS,
+                 timer=time.monotonic):
+        self.timeout = timeout
+        self.timer = timer
+        self.pending: Dict[str, PendingRequest] = {}
+        self.orphaned_responses = cachetools.TTLCache(maxsize=max_orphaned_responses, ttl=orphaned_response_seconds, timer=timer)
+        self.route_statistics: Dict[str, RouteStatistics] = defaultdict(RouteStatistics)
+        self.lock = threading.Lock()
+
+    def register(self, token: str, route: str, connection: Any = None, timeout: Optional[float] = None) -> Future:
+        """Call before sending the request. The future resolves to the answer."""
+        if timeout is None:
+            timeout = self.timeout
+        future = Future()
+        now = self.timer()
+        with self.lock:
+            self.route_statistics[route].requests += 1
+            response = self.orphaned_responses.pop(token, None)
+            if response is None:
+                self.pending[token] = PendingRequest(route, connection, future, sent_at=now, deadline=now + timeout)
+        if response is not None:
+            future.set_result(response)
+        return future
+
+    def resolve(self, response: JSONInfo) -> bool:
+        """Returns False if no request waits for the answer"""
+        token = response['request_token']
+        with self.lock:
+            request = self.pending.pop(token, None)
+            if request is None:
+                self.orphaned_responses[token] = response
+                return False
+            self.route_statistics[request.route].round_trip_times.append(self.timer() - request.sent_at)
+        request.future.set_result(response)
+        return True
+
+    def cancel(self, token: str) -> bool:
+        with self.lock:
+            request = self.pending.pop(token, None)
+            if request is None:
+                return False
+            self.route_statistics[request.route].cancelled += 1
+        request.future.cancel()
+        return True
+
+    def fail(self, token: str, error: BaseException):
+        with self.lock:
+            request = self.pending.pop(token, None)
+            if request is None:
+                return
+            self.route_statistics[request.route].connection_errors += 1
+        request.future.set_exception(error)
+
+    def fail_connection(self, connection: Any, error: BaseException):
+        """Fails all requests that were sent over a connection that was closed"""
+        with self.lock:
+            tokens = [token for token, request in self.pending.items() if request.connection is connection]
+        for token in tokens:
+            self.fail(token, error)
+
+    def expire(self):
+        now = self.timer()
+        with self.lock:
+            expired = [(token, request) for token, request in self.pending.items() if request.deadline <= now]
+            for token, request in expired:
+                del self.pending[token]
+                self.route_statistics[request.route].timeouts += 1
+        for token, request in expired:
+            request.future.set_exception(TimeoutError(f'No answer to {request.route} after {now - request.sent_at:.1f}s'))
+
+    def statistics(self) -> JSONInfo:
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'orphaned_responses': len(self.orphaned_responses),
+                'routes': {route: s.to_json() for route, s in sorted(self.route_statistics.items())},
+            }
@@ -4,7 +4,9 @@ from stories.check_game_state import CheckGameState
 from stories.choose_event import ChooseEventAction
 from stories.join_server import JoinServer
 from stories.ready import SetReadyStatus
+from stories.resume_push_stream import ResumePushStream
 from stories.start_server import StartServer
+from stories.subscribe_to_depths import SubscribeToDepths
 from stories.story import Story
 from stories.take_action import TakeManagementAction
 
@@ -15,9 +17,11 @@ valid_post_routes: Dict[str, Type[Story]] = {
                                                         CheckGameState,
                                                         SetReadyStatus,
                                                         TakeManagementAction,
-                                                        ChooseEventAction,]
+                                                        ChooseEventAction,
+                                                        ResumePushStream,
+                                                        SubscribeToDepths,]
 }
 
-read_only_routes = [CheckGameState]
+read_only_routes = [CheckGameState, ResumePushStream, SubscribeToDepths]
 
-push_message_types = set()
+push_message_types = {'game_state_update'}
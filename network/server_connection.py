@@ -0,0 +1,217 @@
+import json
+import threading
+from concurrent.futures import Future
+from typing import Optional, Callable
+from uuid import uuid4
+
+import websocket
+
+from debug import debug
+from lib.compact_dict_string import compact_object_string
+from lib.infinite_timer import InfiniteTimer
+from lib.print_exc_plus import print_exc_plus
+from lib.util import EBC
+from network.my_types import JSONInfo, MessageType, Message
+from network.response_router import ResponseRouter
+from stories.error_message import ConnectionErrorMessage
+
+CONNECTION_ERRORS = (ConnectionResetError, websocket.WebSocketConnectionClosedException)
+EXPIRE_REQUESTS_SECONDS = 1
+
+
+def host_url(server_address: str, port: int) -> str:
+    """
+    The host for a server address like `example.com` or `example.com/mygame`.
+    The game name selects a game behind a `run_router`, without one the router connects to its default game.
+    """
+    address, _, game_name = server_address.strip().partition('/')
+    return f'http://{address}:{port}' + (f'/{game_name}' if game_name else '')
+
+
+class ServerConnection(EBC):
+    """
+    The client side of the websocket protocol, independent of any user interface.
+    A network thread owns the receiving end of the socket: it hands each answer to the request with the same
+    request_token and push messages to the push message handler, so that any number of requests can be in flight.
+    """
+
+    def __init__(self,
+                 push_message_handler: Optional[Callable[[MessageType, Message], None]] = None,
+                 reconnect_handler: Optional[Callable[[], None]] = None,
+                 result_handler: Optional[Callable[[Callable[[], None]], None]] = None):
+        self.websocket: websocket.WebSocket = websocket.WebSocket(enable_multithread=True)
+        self.response_router = ResponseRouter()
+        self.expire_timer: Optional[InfiniteTimer] = None
+        self.connect_lock = threading.Lock()
+        self.push_message_handler = push_message_handler
+        # called after the websocket was connected again, while push messages of the previous connection may be missing
+        self.reconnect_handler = reconnect_handler
+        # runs the callbacks of asynchronous requests, for example on the GUI thread. By default they run on the network thread.
+        self.result_handler = result_handler
+        self.push_stream_id: Optional[str] = None
+        self.last_push_seq: Optional[int] = None
+
+    def connected(self):
+        return self.websocket.connected
+
+    def close(self):
+        self.websocket.abort()  # wakes up the network thread instead of waiting for it to read the answer to the close frame
+        self.websocket.close()
+        if self.expire_timer is not None:
+            self.expire_timer.cancel()
+            self.expire_timer = None
+
+    def set_push_stream_position(self, stream_id: Optional[str], seq: Optional[int]):
+        """Remembers up to which push message the local state is known, to resume from there after reconnecting"""
+        if stream_id != self.push_stream_id or self.last_push_seq is None or seq > self.last_push_seq:
+            self.push_stream_id = stream_id
+            self.last_push_seq = seq
+
+    def statistics(self) -> JSONInfo:
+        """Round-trip times, timeouts and errors per route, for diagnosing a slow server"""
+        return self.response_router.statistics()
+
+    def server_request(self, host: str, route: str, data: JSONInfo, timeout: Optional[float] = None) -> JSONInfo:
+        return self.server_request_async(host, route, data, timeout=timeout).result()
+
+    def server_request_async(self, host: str, route: str, data: JSONInfo,
+                             callback: Optional[Callable[[Future], None]] = None,
+                             timeout: Optional[float] = None) -> Future:
+        """
+        Sends the request without waiting for the answer.
+        The returned future resolves to the body of the answer or raises a ConnectionErrorMessage for failed requests,
+        including requests that got no answer within `timeout` seconds. Cancelling the future cancels the request.
+        `callback` is called with the future once it is done, through the result handler.
+        """
+        token = str(uuid4())
+        payload = json.dumps({'route': route, 'body': data, 'request_token': token})
+        result = Future()
+
+        def cancel_if_cancelled(future: Future):
+            if future.cancelled():
+                self.response_router.cancel(token)
+
+        result.add_done_callback(cancel_if_cancelled)
+        if callback is not None:
+            result.add_done_callback(lambda future: self._run_callback(callback, future))
+
+        def finish(attempt: Future, retried: bool):
+            if attempt.cancelled() or result.done():
+                return
+            e = attempt.exception()
+            if isinstance(e, CONNECTION_ERRORS) and not retried:
+                # The connection dropped before the answer arrived. Retry once with the same token,
+                # the server replays its original answer if it already executed the request.
+                print('Lost connection while waiting for', route, '- retrying:', repr(e))
+                self._send(host, route, payload, token, timeout).add_done_callback(lambda a: finish(a, True))
+            elif isinstance(e, TimeoutError):
+                result.set_exception(ConnectionErrorMessage(title='Request timed out', msg=f'The server "{host}" did not answer: {e}'))
+            elif e is not None:
+                result.set_exception(e)
+            else:
+                try:
+                    result.set_result(self._body(host, payload, attempt.result()))
+                except ConnectionErrorMessage as error:
+                    result.set_exception(error)
+
+        self._send(host, route, payload, token, timeout).add_done_callback(lambda a: finish(a, False))
+        return result
+
+    def _run_callback(self, callback: Callable[[Future], None], future: Future):
+        if self.result_handler is None:
+            callback(future)
+        else:
+            self.result_handler(lambda: callback(future))
+
+    @staticmethod
+    def _body(host: str, payload: str, json_content: JSONInfo) -> JSONInfo:
+        status_code = json_content['http_status_code']
+        if status_code == 200:
+            pass
+        else:
+            formatted_request = compact_object_string(json.loads(payload), max_line_length=100)
+            formatted_response = compact_object_string(json_content, max_line_length=100)
+            if 'body' in json_content and 'error' in json_content['body'] and not debug:
+                raise ConnectionErrorMessage(title=f'Failed request: Code {status_code}', msg=json_content['body']['error'])
+            else:
+                raise ConnectionErrorMessage(title=f'Failed request: Code {status_code}',
+                                             msg=f'A network request to "{host}" failed.\nRequest was: \n```\n{formatted_request}\n```\nResponse was:\n```\n{formatted_response}\n```')
+
+        return json_content['body']
+
+    def _send(self, host: str, route: str, payload: str, token: str, timeout: Optional[float]) -> Future:
+        """Sends one attempt of a request, the future resolves to the full answer including the status code"""
+        ws = None
+        future = None
+        try:
+            ws = self._connect(host)
+            future = self.response_router.register(token, route, connection=ws, timeout=timeout)
+            if future.done():  # the answer to an earlier attempt arrived after all
+                return future
+            if debug:
+                print('Sending to websocket:', str(payload).replace('{', '\n{')[1:])
+            ws.send(payload, opcode=2)
+        except Exception as e:
+            if isinstance(e, CONNECTION_ERRORS) and ws is not None:
+                ws.abort()
+            if future is None:
+                future = Future()
+                future.set_exception(e)
+            else:
+                self.response_router.fail(token, e)
+        return future
+
+    def _connect(self, host: str) -> websocket.WebSocket:
+        """Connects if necessary"""
+        with self.connect_lock:
+            ws = self.websocket
+            if ws.connected:
+                return ws
+            reconnecting = self.push_stream_id is not None
+            ws = websocket.WebSocket(enable_multithread=True)
+            ws.connect(host.replace('http://', 'ws://') + '/websocket')
+            self.websocket = ws
+            threading.Thread(target=self._receive_forever, args=(ws,), name='ServerConnection', daemon=True).start()
+            if self.expire_timer is None:
+                self.expire_timer = InfiniteTimer(seconds=EXPIRE_REQUESTS_SECONDS, target=self.response_router.expire)
+                self.expire_timer.start()
+        if reconnecting and self.reconnect_handler is not None:
+            self.reconnect_handler()
+        return ws
+
+    def _receive_forever(self, ws: websocket.WebSocket):
+        """Runs on the network thread of one websocket until it is closed"""
+        error = ConnectionResetError('The connection to the server was closed.')
+        try:
+            while True:
+                json_content = self._receive(ws)
+                if 'request_token' not in json_content:
+                    try:
+                        self._handle_push_message(json_content)
+                    except Exception:
+                        print_exc_plus()
+                    continue
+                self.response_router.resolve(json_content)
+        except (OSError, websocket.WebSocketException) as e:
+            # also raised when the socket is closed on purpose, pending requests are told about it
+            error = ConnectionResetError(str(e))
+        finally:
+            ws.shutdown()
+            self.response_router.fail_connection(ws, error)
+
+    @staticmethod
+    def _receive(ws: websocket.WebSocket) -> JSONInfo:
+        received = ws.recv_data_frame()[1].data
+        content = received.decode('utf-8')
+        json_content = json.loads(content)
+        if debug:
+            print('Received through websocket:\n' + compact_object_string(json_content, max_line_length=200, max_depth=3))
+        return json_content
+
+    def _handle_push_message(self, json_content: JSONInfo):
+        if 'seq' in json_content:
+            if json_content['stream_id'] == self.push_stream_id and json_content['seq'] <= self.last_push_seq:
+                return  # already received before reconnecting
+            self.set_push_stream_position(json_content['stream_id'], json_content['seq'])
+        if self.push_message_handler is not None and 'message_type' in json_content:
+            self.push_message_handler(json_content['message_type'], json_content['contents'])
@@ -0,0 +1,184 @@
+from collections import deque
+from typing import Optional, List, Dict, FrozenSet, Set, Tuple, Deque
+
+from data.game_state import GameState
+from lib.json_diff import json_diff, JSONDiffOp, compact_json_diff
+from network import connection
+from network.my_types import JSONInfo, UserName
+
+GAME_STATE_UPDATE = 'game_state_update'
+GAME_DETAIL_KEYS = ['players', 'ready_players', 'game_results']  # only sent for the depths a user subscribed to
+STATE_DIFF_HISTORY_LENGTH = 100  # clients that know one of the last versions get a diff instead of the full state
+
+# the depths of the nested matches each user receives the details of, users without an entry receive all depths
+depth_subscriptions: Dict[UserName, FrozenSet[int]] = {}
+
+
+def prune_game_json(game_json: Optional[JSONInfo], depths: FrozenSet[int], depth=0) -> Optional[JSONInfo]:
+    """A copy of the JSON of a game and its ongoing matches, without the details of the depths that are not in `depths`"""
+    if game_json is None:
+        return None
+    result = {k: v for k, v in game_json.items() if depth in depths or k not in GAME_DETAIL_KEYS}
+    if result.get('ongoing_match') is not None:
+        result['ongoing_match'] = prune_game_json(result['ongoing_match'], depths, depth + 1)
+    return result
+
+
+def prune_state_json(state_json: JSONInfo, depths: Optional[FrozenSet[int]]) -> JSONInfo:
+    if depths is None or 'game' not in state_json:
+        return state_json
+    return {**state_json, 'game': prune_game_json(state_json['game'], depths)}
+
+
+def state_for_user(gs: GameState, username: UserName) -> JSONInfo:
+    """The game state as a user gets to see it, with the depths they subscribed to"""
+    return prune_state_json(gs.info_for_user(username), depth_subscriptions.get(username))
+
+
+def prune_state_diff(diff: List[JSONDiffOp], depths: Optional[FrozenSet[int]]) -> List[JSONDiffOp]:
+    """The operations of a diff of the full state that are needed to update the state pruned with `prune_state_json`"""
+    if depths is None:
+        return diff
+    result = []
+    for op in diff:
+        path = op['path']
+        if len(path) == 0:
+            if op['op'] == 'set':
+                op = {**op, 'value': prune_state_json(op['value'], depths)}
+            result.append(op)
+            continue
+        if path[0] != 'game':
+            result.append(op)
+            continue
+        depth = 0
+        idx = 1
+        while idx < len(path) and path[idx] == 'ongoing_match':
+            depth += 1
+            idx += 1
+        if idx == len(path):  # a whole game is replaced
+            if op['op'] == 'set':
+                op = {**op, 'value': prune_game_json(op['value'], depths, depth)}
+            result.append(op)
+        elif depth in depths or path[idx] not in GAME_DETAIL_KEYS:
+            result.append(op)
+    return result
+
+
+def changed_depths(diff: List[JSONDiffOp]) -> Tuple[Set[int], Optional[int]]:
+    """
+    The depths of the games that a diff of the state changes, and the smallest depth from which on all games are replaced
+    (None if no game is replaced). Replacing a nested game also changes the game it is the ongoing match of.
+    """
+    depths = set()
+    replaced_from = None
+    for op in diff:
+        path = op['path']
+        if len(path) == 0:
+            return depths, 0
+        if path[0] != 'game':
+            continue
+        depth = 0
+        idx = 1
+        while idx < len(path) and path[idx] == 'ongoing_match':
+            depth += 1
+            idx += 1
+        if idx == len(path):  # a whole game is replaced
+            if depth > 0:
+                depths.add(depth - 1)
+            if replaced_from is None or depth < replaced_from:
+                replaced_from = depth
+        else:
+            depths.add(depth)
+    return depths, replaced_from
+
+
+class StateUpdate:
+    def __init__(self, base_version: int, version: int, diff: List[JSONDiffOp], public_state: JSONInfo):
+        self.base_version = base_version
+        self.version = version
+        self.diff = diff
+        self.public_state = public_state
+
+    def message(self) -> JSONInfo:
+        return {'base_version': self.base_version, 'version': self.version, 'diff': self.diff}
+
+
+def merge_state_updates(first: JSONInfo, second: JSONInfo) -> Optional[JSONInfo]:
+    """One update that has the effect of both, with the operations of `first` that `second` overwrites dropped"""
+    if first['version'] != second['base_version']:
+        return None
+    return {'base_version': first['base_version'],
+            'version': second['version'],
+            'diff': compact_json_diff(first['diff'] + second['diff'])}
+
+
+connection.push_message_mergers[GAME_STATE_UPDATE] = merge_state_updates
+
+
+class StateUpdateTracker:
+    """
+    Remembers the game state as it was last published to the clients.
+    After a request changed the state, the difference is pushed to the users instead of the clients polling for the full state.
+    """
+
+    def __init__(self, history_length=STATE_DIFF_HISTORY_LENGTH):
+        self.public_state: Optional[JSONInfo] = None
+        self.history: Deque[JSONInfo] = deque(maxlen=history_length)  # the most recent published updates
+
+    @staticmethod
+    def public_info(gs: GameState) -> JSONInfo:
+        """The part of the game state that all users can see, without the version number"""
+        json_info = gs.info_for_user(None)
+        del json_info['version']
+        return json_info
+
+    def reset(self, gs: GameState):
+        self.public_state = self.public_info(gs)
+        self.history.clear()
+
+    def prepare(self, gs: GameState) -> Optional[StateUpdate]:
+        """Call before committing: increases the version of the game state if anything visible changed"""
+        public_state = self.public_info(gs)
+        diff = json_diff(self.public_state, public_state)
+        if len(diff) == 0:
+            return None
+        gs.version += 1
+        return StateUpdate(base_version=gs.version - 1, version=gs.version, diff=diff, public_state=public_state)
+
+    def publish(self, gs: GameState, update: Optional[StateUpdate]):
+        """Call after committing successfully"""
+        if update is None:
+            return
+        self.public_state = update.public_state
+        self.history.append(update.message())
+        users_by_subscription: Dict[Optional[FrozenSet[int]], List[UserName]] = {}
+        for user in gs.users:
+            users_by_subscription.setdefault(depth_subscriptions.get(user.username), []).append(user.username)
+        for depths, usernames in users_by_subscription.items():
+            message = update.message()
+            message['diff'] = prune_state_diff(message['diff'], depths)
+            connection.enqueue_push_message(usernames, message, GAME_STATE_UPDATE)
+
+    def diff_since(self, version: int, current_version: int) -> Optional[List[JSONDiffOp]]:
+        """
+        The operations that turn the public state of `version` into the one of `current_version`,
+        or None if the updates in between are not remembered anymore.
+        """
+        updates = list(self.history)
+        for idx, update in enumerate(updates):
+            if update['base_version'] == version:
+                break
+        else:
+            return None
+        diff = []
+        for update in updates[idx:]:
+            if update['base_version'] != version:
+                return None
+            diff.extend(update['diff'])
+            version = update['version']
+        if version != current_version:
+            return None
+        return compact_json_diff(diff)
+
+
+state_update_tracker = StateUpdateTracker()
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import time
+from email.utils import formatdate
+from typing import Dict, Optional, List
+
+import bottle
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+
+class StaticAsset:
+    """A file of the frontend, kept in memory together with pre-compressed variants and their ETags"""
+
+    def __init__(self, path: str, content: bytes, last_modified: float):
+        self.path = path
+        self.last_modified = formatdate(last_modified, usegmt=True)
+        content_type, _ = mimetypes.guess_type(path)
+        if content_type is None:
+            content_type = 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=UTF-8'
+        self.content_type = content_type
+        self.variants: Dict[str, bytes] = {'identity': content}
+        if content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(content)
+                if len(compressed) < len(content):
+                    self.variants['br'] = compressed
+        self.content_hash = hashlib.sha256(content).hexdigest()[:32]
+
+    def etag(self, encoding: str):
+        # strong ETags must differ between encodings of the same file
+        if encoding == 'identity':
+            return f'"{self.content_hash}"'
+        return f'"{self.content_hash}-{encoding}"'
+
+    def matches(self, if_none_match: Optional[str]):
+        if if_none_match is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if '*' in tags:
+            return True
+        tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+        return any(self.etag(encoding) in tags for encoding in self.variants)
+
+    def best_encoding(self, accept_encoding: Optional[str]) -> str:
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ['br', 'gzip']:
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return 'identity'
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> List[str]:
+    if accept_encoding is None:
+        return []
+    result = []
+    for part in accept_encoding.split(','):
+        encoding, *params = [p.strip() for p in part.split(';')]
+        q = 1.
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.
+        if q > 0:
+            result.append(encoding.lower())
+    return result
+
+
+class StaticAssetIndex:
+    """
+    All files below a directory, read once at startup instead of on every request.
+    Call `rebuild` to pick up changed files.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        start = time.perf_counter()
+        assets = {}
+        for subdir, dirs, files in os.walk(self.root):
+            for filename in files:
+                file_path = os.path.join(subdir, filename)
+                relative_path = os.path.relpath(file_path, self.root).replace('\\', '/')
+                with open(file_path, 'rb') as f:
+                    content = f.read()
+                assets[relative_path] = StaticAsset(relative_path, content, os.path.getmtime(file_path))
+        self.assets = assets
+        print(f'Indexed {len(assets)} static files in {time.perf_counter() - start:.4f}s')
+        return len(assets)
+
+    def response(self, relative_path: str, accept_encoding: Optional[str] = None, if_none_match: Optional[str] = None) -> bottle.HTTPResponse:
+        asset = self.assets.get(relative_path.lstrip('/'))
+        if asset is None:
+            return bottle.HTTPResponse(status=404, body='File does not exist.')
+        encoding = asset.best_encoding(accept_encoding)
+        headers = {
+            'ETag': asset.etag(encoding),
+            'Last-Modified': asset.last_modified,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': 'no-cache',
+        }
+        if asset.matches(if_none_match):
+            return bottle.HTTPResponse(status=304, **headers)
+        body = asset.variants[encoding]
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        headers['Content-Type'] = asset.content_type
+        headers['Content-Length'] = str(len(body))
+        return bottle.HTTPResponse(body=body, status=200, **headers)
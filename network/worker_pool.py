@@ -0,0 +1,186 @@
+import socket
+import subprocess
+import time
+from typing import Dict, Optional, Iterable
+
+import gevent
+import gevent.event
+import websocket as websocket_client
+from gevent.threading import Lock
+from geventwebsocket.websocket import WebSocket
+
+from data.game_state import GameState
+from run_server import server_call
+
+WORKER_STARTUP_TIMEOUT = 30
+MAX_WORKERS = 16
+WORKER_HOST = '127.0.0.1'
+
+
+class WorkerLimitReached(RuntimeError):
+    pass
+
+
+class Worker:
+    """A `run_server` process that owns exactly one save game. It only listens on the loopback interface, so clients have to go through the router."""
+
+    def __init__(self, game_name: str, port: int):
+        self.game_name = game_name
+        self.port = port
+        self.started = gevent.event.Event()  # set once the worker listens, or its startup failed
+        self.startup_error: Optional[Exception] = None
+        self.process = self.spawn_process()
+
+    def spawn_process(self) -> subprocess.Popen:
+        return subprocess.Popen(server_call(game_name=self.game_name, port=self.port, host=WORKER_HOST))
+
+    def http_url(self):
+        return f'http://{WORKER_HOST}:{self.port}'
+
+    def websocket_url(self):
+        return f'ws://{WORKER_HOST}:{self.port}/websocket'
+
+    def connect_websocket(self) -> websocket_client.WebSocket:
+        return websocket_client.create_connection(self.websocket_url())
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def start(self):
+        try:
+            self.wait_until_listening()
+        except Exception as e:
+            self.startup_error = e
+            self.stop()
+            raise
+        finally:
+            self.started.set()
+
+    def wait_until_started(self):
+        if not self.started.wait(WORKER_STARTUP_TIMEOUT):
+            raise TimeoutError(f'Server process for game {self.game_name} did not start listening on port {self.port}')
+        if self.startup_error is not None:
+            raise RuntimeError(f'Server process for game {self.game_name} failed to start') from self.startup_error
+
+    def wait_until_listening(self):
+        deadline = time.perf_counter() + WORKER_STARTUP_TIMEOUT
+        while True:
+            if not self.alive():
+                raise RuntimeError(f'Server process for game {self.game_name} exited with code {self.process.returncode}')
+            try:
+                socket.create_connection((WORKER_HOST, self.port), timeout=1).close()
+                return
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f'Server process for game {self.game_name} did not start listening on port {self.port}')
+                gevent.sleep(0.2)
+
+    def stop(self):
+        if self.alive():
+            self.process.terminate()
+
+
+def port_is_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind((WORKER_HOST, port))
+        except OSError:
+            return False
+    return True
+
+
+class WorkerPool:
+    """
+    Assigns every save game to its own worker process (game affinity), so that independent tournaments run on different CPU cores.
+    A worker can only own a single game because the game state of a server process is the global `server_gamestate.gs`.
+    Workers are only started for games that have a save file or are in `allowed_games`, and at most `max_workers` at once.
+    """
+
+    def __init__(self, first_worker_port: int, allowed_games: Iterable[str] = (), max_workers=MAX_WORKERS):
+        self.next_port = first_worker_port
+        self.allowed_games = set(allowed_games)
+        self.max_workers = max_workers
+        self.workers: Dict[str, Worker] = {}
+        self.lock = Lock()
+
+    def may_run(self, game_name: str) -> bool:
+        return game_name in self.allowed_games or GameState.save_file_exists(game_name)
+
+    def worker_for_game(self, game_name: str) -> Optional[Worker]:
+        """None for unknown games. Starting a worker happens outside the lock, so that requests for other games do not wait for it."""
+        if not self.may_run(game_name):
+            return None
+        with self.lock:
+            worker = self.workers.get(game_name)
+            starting = worker is None or not worker.alive()
+            if starting:
+                if worker is None and sum(w.alive() for w in self.workers.values()) >= self.max_workers:
+                    raise WorkerLimitReached(f'Already running {self.max_workers} games')
+                worker = self.create_worker(game_name, self.free_port(None if worker is None else worker.port))
+                self.workers[game_name] = worker
+                print('Started worker for game', game_name, 'on port', worker.port)
+        if starting:
+            worker.start()
+        else:
+            worker.wait_until_started()
+        return worker
+
+    def create_worker(self, game_name: str, port: int) -> Worker:
+        return Worker(game_name, port)
+
+    def free_port(self, preferred: Optional[int]) -> int:
+        """The port of a crashed worker if it can be reused, otherwise the next free port"""
+        if preferred is not None and port_is_free(preferred):
+            return preferred
+        while not port_is_free(self.next_port):
+            self.next_port += 1
+        self.next_port += 1
+        return self.next_port - 1
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
+
+
+def relay_websocket(ws: WebSocket, worker: Worker):
+    """Forwards frames between a client websocket and a websocket to the worker, in both directions, until one side closes."""
+    upstream = worker.connect_websocket()
+
+    def client_to_worker():
+        while True:
+            msg = ws.receive()
+            if msg is None:
+                break
+            upstream.send(msg, opcode=websocket_client.ABNF.OPCODE_BINARY if isinstance(msg, (bytes, bytearray)) else websocket_client.ABNF.OPCODE_TEXT)
+
+    def worker_to_client():
+        # responses as well as push messages, so pushes reach the right socket without any bookkeeping in the router
+        while True:
+            msg = upstream.recv()
+            if msg is None or msg == '':
+                break
+            ws.send(msg)
+
+    greenlets = [gevent.spawn(client_to_worker), gevent.spawn(worker_to_client)]
+    try:
+        gevent.joinall(greenlets, count=1, raise_error=False)
+    finally:
+        gevent.killall(greenlets)
+        upstream.close()
+        if not ws.closed:
+            ws.close()
+
+
+def relay_to_game(ws: WebSocket, pool: WorkerPool, game_name: str):
+    """Relays a client websocket to the worker of a game, or closes it if the pool can not run that game"""
+    try:
+        worker = pool.worker_for_game(game_name)
+    except WorkerLimitReached as e:
+        ws.close(code=1013, message=str(e).encode())
+        return
+    if worker is None:
+        # the handshake already happened, so a 404 is not possible anymore
+        ws.close(code=4404, message=f'Unknown game {game_name}'.encode())
+        return
+    relay_websocket(ws, worker)
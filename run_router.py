@@ -0,0 +1,87 @@
+from gevent import monkey
+
+monkey.patch_all()
+
+import atexit
+import datetime
+import sys
+
+import bottle
+import requests
+import websocket as websocket_client
+# noinspection PyUnresolvedReferences
+from bottle.ext.websocket import GeventWebSocketServer
+# noinspection PyUnresolvedReferences
+from bottle.ext.websocket import websocket
+from geventwebsocket import WebSocketError
+from geventwebsocket.websocket import WebSocket
+
+from debug import debug
+from lib.print_exc_plus import print_exc_plus
+from network import connection
+from network.worker_pool import WorkerPool, Worker, WorkerLimitReached, relay_to_game
+
+if __name__ == '__main__':
+    if len(sys.argv) <= 1:
+        raise RuntimeError(f'Missing required parameter: default game name\n Example call ´python -m run_router mygamename123´')
+    default_game_name = sys.argv[1]
+    if len(sys.argv) >= 3:
+        connection.PORT = int(sys.argv[2])
+    pool = WorkerPool(first_worker_port=connection.PORT + 1, allowed_games=[default_game_name])
+    atexit.register(pool.stop)
+    pool.worker_for_game(default_game_name)
+
+
+    def _worker_or_abort(game_name: str) -> Worker:
+        try:
+            worker = pool.worker_for_game(game_name)
+        except WorkerLimitReached as e:
+            bottle.abort(503, str(e))
+        if worker is None:
+            bottle.abort(404, f'Unknown game {game_name}')
+        return worker
+
+
+    def _forward_json(game_name: str, path: str):
+        worker = _worker_or_abort(game_name)
+        r = requests.post(f'{worker.http_url()}/json/{path}',
+                          data=bottle.request.body.read(),
+                          headers={'Content-type': bottle.request.content_type})
+        bottle.response.status = r.status_code
+        bottle.response.content_type = r.headers.get('Content-type', 'application/json; charset=latin-1')
+        return r.content
+
+
+    @bottle.route('/json/<path>', method='POST')
+    def process(path):
+        return _forward_json(default_game_name, path)
+
+
+    @bottle.route('/<game_name>/json/<path>', method='POST')
+    def process_for_game(game_name, path):
+        return _forward_json(game_name, path)
+
+
+    def _relay(ws: WebSocket, game_name: str):
+        print('websocket connection', *ws.handler.client_address, 'for game', game_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        # noinspection PyBroadException
+        try:
+            relay_to_game(ws, pool, game_name)
+        except (WebSocketError, ConnectionError, websocket_client.WebSocketException):
+            pass
+        except Exception:
+            print_exc_plus()
+        print('websocket connection ended', *ws.handler.client_address, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+    @bottle.get('/websocket', apply=[websocket])
+    def default_game_websocket(ws: WebSocket):
+        _relay(ws, default_game_name)
+
+
+    @bottle.get('/<game_name>/websocket', apply=[websocket])
+    def game_websocket(ws: WebSocket, game_name):
+        _relay(ws, game_name)
+
+
+    bottle.run(host='0.0.0.0', port=connection.PORT, debug=debug, server=GeventWebSocketServer)
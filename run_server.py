@@ -1,4 +1,3 @@
-import datetime
 import json
 import os
 import re
@@ -8,6 +7,7 @@ from json import JSONDecodeError
 from typing import Dict, Any, Union, Optional
 
 import bottle
+import gevent
 # noinspection PyUnresolvedReferences
 from bottle.ext.websocket import GeventWebSocketServer
 # noinspection PyUnresolvedReferences
@@ -25,6 +25,9 @@ from lib.print_exc_plus import print_exc_plus
 from lib.threading_timer_decorator import exit_after
 from lib.util import rename
 from network.routes import valid_post_routes, read_only_routes
+from network.request_log import request_log
+from network.state_updates import state_update_tracker
+from network.static_assets import StaticAssetIndex
 
 FRONTEND_RELATIVE_PATH = './html'
 
@@ -46,11 +49,12 @@ def call_controller_method_with_timeout(method, json_request: Dict[str, Any]):
     return method(json_request)
 
 
-def _process(path, json_request):
+def _process(path, json_request, ws_connection: Optional[connection.WebSocketConnection] = None):
     start = time.perf_counter()
     path = path.strip().lower()
     bottle.response.content_type = 'application/json; charset=latin-1'
     reset_global_variables()
+    connection.current_connection = ws_connection
     # noinspection PyBroadException
     try:
         json_request = json_request()
@@ -58,7 +62,6 @@ def _process(path, json_request):
             bottle.response.status = 400
             resp = connection.bad_request('Only json allowed.')
         elif path not in valid_post_routes:
-            print('Processing time:', time.perf_counter() - start)
             resp = connection.not_found('URL not available')
         else:
             method_to_call = valid_post_routes[path](None).from_client
@@ -71,11 +74,18 @@ def _process(path, json_request):
             bottle.response.status = 200
         if bottle.response.status_code == 200:
             if valid_post_routes[path] not in read_only_routes:
+                state_update = state_update_tracker.prepare(server_gamestate.gs)
                 server_gamestate.gs.commit()
+                state_update_tracker.publish(server_gamestate.gs, state_update)
                 connection.push_messages_in_queue()
+                # clients can tell whether they already received the state containing the effects of the request
+                resp['state_version'] = server_gamestate.gs.version
         else:
             server_gamestate.gs.rollback()
-        print('route=' + path, f't={time.perf_counter() - start:.4f}s,')
+        if path in valid_post_routes and valid_post_routes[path] in read_only_routes:
+            request_log.log('read_only_request', route=path, t=time.perf_counter() - start, status=bottle.response.status_code)
+        else:
+            request_log.log('request', route=path, t=time.perf_counter() - start, status=bottle.response.status_code)
         return resp
     except JSONDecodeError:
         return handle_error('Unable to decode JSON', path, start)
@@ -90,14 +100,32 @@ def _process(path, json_request):
         return handle_error('Unknown error', path, start)
 
 
-def server_call(game_name: str, port: Optional[Union[int, str]] = None):
+def _process_once(path, json_request: Dict[str, Any], request_token: Optional[str], username: Optional[str],
+                  ws_connection: Optional[connection.WebSocketConnection] = None) -> Dict[str, Any]:
+    """Like `_process`, but a retried state-changing request (same user, route and request_token) gets the original response instead of running again"""
+    if request_token is not None:
+        replayed_result_json = connection.replay_cache.get(username, path, request_token)
+        if replayed_result_json is not None:
+            bottle.response.status = 200
+            return replayed_result_json
+    result_json = _process(path, lambda: json_request, ws_connection)
+    if request_token is not None and bottle.response.status_code == 200 and valid_post_routes[path.strip().lower()] not in read_only_routes:
+        connection.replay_cache.put(username, path, request_token, result_json)
+    return result_json
+
+
+def server_call(game_name: str, port: Optional[Union[int, str]] = None, host: Optional[str] = None):
     args = [game_name]
-    if port is not None:
-        args.append(str(port))
+    if port is not None or host is not None:
+        args.append(str(connection.PORT if port is None else port))
+    if host is not None:
+        args.append(host)
     if os.path.isfile('run_server.py'):
         return ['python', '-m', 'run_server', *args]
     elif os.path.isfile('run_server.exe'):
         return ['run_server.exe', *args]
+    else:
+        raise FileNotFoundError(f'Neither run_server.py nor run_server.exe is in the working directory {os.getcwd()}')
 
 
 if __name__ == '__main__':
@@ -111,14 +139,25 @@ if __name__ == '__main__':
         server_gamestate.gs = AppGameState.load(save_path)
     else:
         server_gamestate.gs = AppGameState.create(game_name=save_path)
+    server_gamestate.gs.commit()  # saves from before epochs existed would get a new one with every rollback
+    state_update_tracker.reset(server_gamestate.gs)
     if len(sys.argv) >= 3:
         connection.PORT = int(sys.argv[2])
+    host = sys.argv[3] if len(sys.argv) >= 4 else '0.0.0.0'
 
 
     @bottle.route('/json/<path>', method='POST')
     def process(path):
         with request_lock:
-            return _process(path, lambda: bottle.request.json)
+            try:
+                json_request = bottle.request.json
+            except JSONDecodeError:
+                return _process(path, lambda: bottle.request.json)  # answers with the decoding error
+            if not isinstance(json_request, dict):
+                return _process(path, lambda: json_request)
+            # HTTP clients can send a request_token in the body, to retry requests like over the websocket
+            username = server_gamestate.gs.username_by_session_id(json_request.get('session_id'))
+            return _process_once(path, json_request, json_request.get('request_token'), username)
 
 
     @bottle.route('/', method='GET')
@@ -131,13 +170,14 @@ if __name__ == '__main__':
         bottle.response.status = 500
         print_exc_plus()
         server_gamestate.gs.rollback()
-        print('route=' + str(path), f't={time.perf_counter() - start:.4f}s,')
+        request_log.error('request', route=path, t=time.perf_counter() - start, message=message)
         return connection.internal_server_error(message)
 
 
     @bottle.get('/websocket', apply=[websocket])
     def websocket(ws: WebSocket):
-        print('websocket connection', *ws.handler.client_address, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        request_log.log('websocket_connection', client_address=ws.handler.client_address)
+        ws_connection = connection.WebSocketConnection(ws)
         while True:
             start = time.perf_counter()
             path = None
@@ -159,6 +199,7 @@ if __name__ == '__main__':
                         raise
 
                 if msg is not None:  # received some message
+                    connection.websockets.touch(ws)
                     with request_lock:
                         msg = bytes(msg)
 
@@ -166,44 +207,29 @@ if __name__ == '__main__':
                         path = outer_json['route']
                         inner_json = outer_json['body']
                         request_token = outer_json['request_token']
-                        inner_result_json = _process(path, lambda: inner_json)
+                        ws_connection.authenticate_request(inner_json.get('session_id'))
+                        inner_result_json = _process_once(path, inner_json, request_token, ws_connection.username, ws_connection)
 
                         if 'error' in inner_result_json:
                             status_code = int(inner_result_json['error'][:3])
                         else:
                             status_code = 200
 
-                        # if there is a session_id involved, associate it with this websocket
-                        for json_container in [inner_json, inner_result_json]:
-                            if 'session_id' in json_container and server_gamestate.gs.valid_session_id(
-                                    json_container['session_id']):
-                                user_id = server_gamestate.gs.username_by_session_id(json_container['session_id'])
-
-                                if user_id in connection.websockets_for_user:
-                                    if ws not in connection.websockets_for_user[user_id]:
-                                        connection.websockets_for_user[user_id].append(ws)
-                                else:
-                                    connection.websockets_for_user[user_id] = [ws]
-                                if ws in connection.users_for_websocket:
-                                    if user_id not in connection.users_for_websocket[ws]:
-                                        connection.users_for_websocket[ws].append(user_id)
-                                else:
-                                    connection.users_for_websocket[ws] = [user_id]
+                        # a new session was handed out (JoinServer), bind it to this websocket
+                        if status_code == 200 and 'session_id' in inner_result_json:
+                            ws_connection.authenticate(inner_result_json['session_id'])
                         outer_result_json = {
                             'body': inner_result_json,
                             'http_status_code': status_code,
                             'request_token': request_token
                         }
                         outer_result_json = json.dumps(outer_result_json)
-                        if ws.closed:
-                            connection.ws_cleanup(ws)
+                        if not connection.send(ws, outer_result_json):
                             break
-                        ws.send(outer_result_json)
-                        print('websocket message',
-                              *ws.handler.client_address,
-                              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                              status_code,
-                              len(outer_result_json))
+                        request_log.log('websocket_message',
+                                        client_address=ws.handler.client_address,
+                                        status=status_code,
+                                        size=len(outer_result_json))
                 else:
                     connection.ws_cleanup(ws)
                     break
@@ -214,15 +240,12 @@ if __name__ == '__main__':
                 if request_token is not None:
                     inner_result_json['request_token'] = request_token
                 inner_result_json = json.dumps(inner_result_json)
-                if ws.closed:
-                    connection.ws_cleanup(ws)
+                if not connection.send(ws, inner_result_json):
                     break
-                ws.send(inner_result_json)
-                print('websocket message',
-                      *ws.handler.client_address,
-                      datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                      status_code,
-                      len(inner_result_json))
+                request_log.error('websocket_message',
+                                  client_address=ws.handler.client_address,
+                                  status=status_code,
+                                  size=len(inner_result_json))
             except Exception:
                 inner_result_json = handle_error('Unknown error', path, start)
                 status_code = 500
@@ -230,15 +253,12 @@ if __name__ == '__main__':
                 if request_token is not None:
                     inner_result_json['request_token'] = request_token
                 inner_result_json = json.dumps(inner_result_json)
-                if ws.closed:
-                    connection.ws_cleanup(ws)
+                if not connection.send(ws, inner_result_json):
                     break
-                ws.send(inner_result_json)
-                print('websocket message',
-                      *ws.handler.client_address,
-                      datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                      status_code,
-                      len(inner_result_json))
+                request_log.error('websocket_message',
+                                  client_address=ws.handler.client_address,
+                                  status=status_code,
+                                  size=len(inner_result_json))
 
 
     def _serve_static_directory(route, root, download=False):
@@ -257,14 +277,6 @@ if __name__ == '__main__':
                 return bottle.static_file(filename, root=root, download=False)
 
 
-    # frontend
-    for subdir, dirs, files in os.walk(FRONTEND_RELATIVE_PATH):
-        # subdir now has the form   ../frontend/config
-        _serve_static_directory(
-            route=subdir.replace('\\', '/').replace(FRONTEND_RELATIVE_PATH, '') + '/<filename>',
-            root=subdir
-        )
-
     # app
     _serve_static_directory(
         route='/app/<filename>',
@@ -272,5 +284,27 @@ if __name__ == '__main__':
         download=True,
     )
 
-    bottle.run(host='0.0.0.0', port=connection.PORT, debug=debug, server=GeventWebSocketServer)
+    # frontend
+    static_assets = StaticAssetIndex(FRONTEND_RELATIVE_PATH)
+
+
+    @bottle.route('/<filepath:path>', method=['GET', 'OPTIONS'])
+    def serve_frontend_file(filepath):
+        if filepath.split('/')[-1] == 'api.json':
+            return {'endpoint': bottle.request.urlparts[0] + '://' + bottle.request.urlparts[1] + '/json/'}
+        return static_assets.response(filepath,
+                                      accept_encoding=bottle.request.get_header('Accept-Encoding'),
+                                      if_none_match=bottle.request.get_header('If-None-Match'))
+
+
+    @bottle.route('/admin/rebuild_static_assets', method='POST')
+    def rebuild_static_assets():
+        if bottle.request.remote_addr not in ['127.0.0.1', '::1']:
+            bottle.response.status = 403
+            return connection.forbidden('Only available from localhost')
+        return {'num_files': static_assets.rebuild()}
+
+
+    gevent.spawn(connection.reap_idle_sockets)
+    bottle.run(host=host, port=connection.PORT, debug=debug, server=GeventWebSocketServer)
     server_gamestate.gs = None
@@ -1,6 +1,12 @@
+import time
+from concurrent.futures import Future
+from typing import Optional
+
 from data import server_gamestate
+from network import connection
 from network.connection import bad_request
 from network.my_types import JSONInfo
+from network.state_updates import state_for_user, depth_subscriptions, state_update_tracker, prune_state_diff
 from stories.story import Story
 
 
@@ -8,21 +14,97 @@ class CheckGameState(Story):
     def from_client(self, json_info: JSONInfo) -> JSONInfo:
         if self.missing_attributes(json_info, ['session_id']):
             return bad_request(self.missing_attributes(json_info, ['session_id']))
-        return {
-            'game_state': server_gamestate.gs.info_for_user(json_info['username']),
+        username = self.session_user(json_info).username
+        depths = depth_subscriptions.get(username)
+        result = {
+            'depths': None if depths is None else sorted(depths),
+            'push_stream': connection.push_stream.position(),
         }
+        known_version = json_info.get('known_version')
+        known_depths = json_info.get('known_depths')
+        if known_depths is not None:
+            known_depths = frozenset(int(depth) for depth in known_depths)
+        # versions of another epoch may be equal without the states being the same
+        if known_version is not None and json_info.get('known_epoch') == server_gamestate.gs.epoch and known_depths == depths:
+            if known_version == server_gamestate.gs.version:
+                # the client already has this version, save sending the whole state
+                result['not_modified'] = True
+                return result
+            diff = state_update_tracker.diff_since(known_version, server_gamestate.gs.version)
+            if diff is not None:
+                # for example a client that reconnects with the state it cached on disk
+                result['state_diff'] = {
+                    'base_version': known_version,
+                    'version': server_gamestate.gs.version,
+                    'diff': prune_state_diff(diff, depths),
+                }
+                return result
+        result['game_state'] = state_for_user(server_gamestate.gs, username)
+        return result
+
+    def __init__(self, ui):
+        super().__init__(ui)
+        self.pending: Optional[Future] = None  # the request of the last `action`
 
     def action(self):
         if not self.client().message_queue.empty():
             return
-        if not self.client().websocket.connected:
+        if not self.client().server_connection.connected():
             return
         if self.client().local_gamestate is None:
             return
-        response = self.to_server()
+        if self.pending is not None and not self.pending.done():
+            return  # the answer to the previous check is still on its way
+        self.pending = self.to_server_async(self.state_request(), self.handle_response)
+
+    def handle_response(self, response: JSONInfo):
         if 'error' in response:
             print('Could not update game state:', response)
             return
-        gs = self.client().local_gamestate.game_state
-        gs.update_from_json(response['game_state'])
+        if response.get('not_modified'):
+            self.client().server_connection.set_push_stream_position(**response['push_stream'])
+            self.client().last_state_update = time.perf_counter()
+            self.client().unchanged_polls += 1
+            return
+        if not self.apply_response(response):
+            self.pending = self.to_server_async(self.state_request(full=True), self.apply_response)
+
+    def state_request(self, full=False) -> JSONInfo:
+        """Unless `full`, tells the server which state the client has, so that it can answer with the changes only"""
+        local_gamestate = self.client().local_gamestate
+        if full or local_gamestate.state_json is None:
+            return {}
+        return {
+            'known_version': local_gamestate.version(),
+            'known_epoch': local_gamestate.epoch(),
+            'known_depths': local_gamestate.depths,
+        }
+
+    def apply_response(self, response: JSONInfo) -> bool:
+        """Returns False if the changes in the response do not fit the local state, then the full state needs to be requested"""
+        local_gamestate = self.client().local_gamestate
+        if self.outdated(response):
+            return True
+        if 'state_diff' in response:
+            if not local_gamestate.apply_state_diff(**response['state_diff']):
+                print('Could not apply the changes since version', response['state_diff']['base_version'])
+                return False
+        else:
+            local_gamestate.apply_full_state(response['game_state'], depths=response.get('depths'))
+        self.client().server_connection.set_push_stream_position(**response['push_stream'])
+        self.client().last_state_update = time.perf_counter()
+        self.client().unchanged_polls = 0
         self.client().after_state_update()
+        return True
+
+    def outdated(self, response: JSONInfo) -> bool:
+        """True if push messages that arrived while the request was on its way already brought the local state further"""
+        local_gamestate = self.client().local_gamestate
+        if local_gamestate.state_json is None:
+            return False
+        if 'state_diff' in response:
+            return response['state_diff']['version'] <= local_gamestate.version()
+        if response['game_state'].get('epoch') != local_gamestate.epoch():
+            return False  # the versions are not comparable, for example after the server started a new game
+        # the same version may still differ in the depths it contains
+        return response['game_state']['version'] < local_gamestate.version()
@@ -19,7 +19,9 @@ class ChooseEventAction(Story):
         self.choice = choice
 
     def from_client(self, json_info: JSONInfo) -> JSONInfo:
-        user = server_gamestate.gs.user_by_session_id(json_info['session_id'])
+        if self.missing_attributes(json_info, ['session_id']):
+            return bad_request(self.missing_attributes(json_info, ['session_id']))
+        user = self.session_user(json_info)
         depth: int = json_info["depth"]
         game = server_gamestate.gs.game_at_depth(depth)
         player = game.player_controlled_by(user.username)
@@ -51,10 +53,27 @@ class ChooseEventAction(Story):
         return {'new_events': [event.to_json()], 'player_name': player.name}
 
     def action(self):
-        response = self.to_server({'choice_title': self.choice_title, 'choice_description': self.choice.text_description(), 'depth': self.ui.depth})
-        new_events = response['new_events']
-        self.client().check_game_state()
-        for event_data in new_events:
-            e = GameEvent.from_json(event_data)
+        self.to_server_async({'choice_title': self.choice_title, 'choice_description': self.choice.text_description(), 'depth': self.ui.depth}, self.handle_response)
+
+    def handle_response(self, response: JSONInfo):
+        new_events = [GameEvent.from_json(event_data) for event_data in response['new_events']]
+        # show the result right away, the next state update from the server reconciles it.
+        # events that sample something, like a player replacement, would turn out differently than on the server
+        if all(e.deterministic() for e in new_events):
+            if self.client().local_gamestate.apply_optimistically(response.get('state_version'), self.ui.depth,
+                                                                  lambda game, player: self.apply_locally(game, player, new_events)):
+                self.client().after_state_update()
+        for e in new_events:
             assert isinstance(e, GameEvent)
             self.ui.handle_game_event(e)
+
+    def apply_locally(self, game, player, new_events: typing.List[GameEvent]):
+        """What `from_client` did on the server, with the outcome it sampled"""
+        if player.name in game.ready_players:
+            del game.ready_players[player.name]
+        for choice_idx, choice in enumerate(player.pending_choices):
+            if choice.title == self.choice_title:
+                del player.pending_choices[choice_idx]
+                break
+        for e in new_events:
+            e.apply(game, player)
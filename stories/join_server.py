@@ -9,6 +9,7 @@ from data.clan_tag import clan_tag_valid, CLAN_TAG_FORMATS
 from lib.my_logger import logging
 from network import connection
 from network.my_types import JSONInfo
+from network.state_updates import depth_subscriptions
 from stories.story import Story
 if typing.TYPE_CHECKING:
     import frontend.src.main_menu
@@ -28,7 +29,8 @@ class JoinServer(Story):
             logging.info(f'New user: {user.username}')
             state.new_user(user, initialize=True)
         else:
-            user.session_id = session_id
+            state.set_session_id(user, session_id)
+        depth_subscriptions.pop(user.username, None)  # a new client starts without subscriptions
         return {'session_id': user.session_id, 'game_name': state.game_name}
 
     def action(self):
@@ -39,11 +41,17 @@ class JoinServer(Story):
             self.ui.critical('Invalid username', self.username_format_description())
             return
         user = AppUser(username=username)
-        response = self.to_server({'username': user.username})
+        self.to_server_async({'username': user.username}, lambda response: self.handle_response(user, response))
+
+    def handle_response(self, user: AppUser, response: JSONInfo):
         user.session_id = response['session_id']
         gs = AppGameState(game_name=response['game_name'])
         gs.new_user(user, initialize=False)
         self.client().local_gamestate = AppLocalGameState(gs, main_user_name=user.username)
+        cached = self.client().state_cache.load(self.client().host, gs.game_name, user.username)
+        if cached is not None:
+            # shown until the server sent the changes since then
+            self.client().local_gamestate.apply_full_state(cached['state_json'], depths=cached['depths'])
         self.client().open_manager_window(depth=gs.depth())
 
     def username_format_description(self):
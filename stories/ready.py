@@ -1,9 +1,12 @@
 import typing
+from typing import Dict
 
 from data import server_gamestate
+from data.player_name import PlayerName
 from data.waiting_condition import WaitingCondition
-from network.connection import precondition_failed
+from network.connection import precondition_failed, bad_request
 from network.my_types import JSONInfo
+from network.request_log import request_log
 from stories.story import Story
 
 if typing.TYPE_CHECKING:
@@ -19,7 +22,9 @@ class SetReadyStatus(Story):
         self.ui = ui
 
     def from_client(self, json_info: JSONInfo) -> JSONInfo:
-        user = server_gamestate.gs.user_by_session_id(json_info['session_id'])
+        if self.missing_attributes(json_info, ['session_id']):
+            return bad_request(self.missing_attributes(json_info, ['session_id']))
+        user = self.session_user(json_info)
         ready = bool(json_info['ready'])
         depth = json_info["depth"]
         game = server_gamestate.gs.game_at_depth(depth)
@@ -37,16 +42,21 @@ class SetReadyStatus(Story):
         for _ in range(self.MAX_GAMES_PER_REQUEST):
             if game.ongoing_match is None:
                 if game.everyone_ready_for_match_start():
-                    print(f'Start of match {len(game.game_results)} at depth {depth}')
-                    game.start_match()
+                    request_log.log('match_start', match_idx=len(game.game_results), depth=depth)
+                    self.log_cleared_ready_statuses(game.start_match())
             if game.ongoing_match is not None and game.everyone_ready_for_match_end():
-                print(f'End of match {len(game.game_results)} at depth {depth}')
-                game.skip_to_end_of_ongoing_match()
+                request_log.log('match_end', match_idx=len(game.game_results), depth=depth)
+                self.log_cleared_ready_statuses(game.skip_to_end_of_ongoing_match())
         assert not game.everyone_ready_for_match_start()
         assert not game.everyone_ready_for_match_end()
 
         return {'ready': ready, 'player_name': player_name}
 
+    @staticmethod
+    def log_cleared_ready_statuses(cleared: Dict[PlayerName, str]):
+        for player_name, reason in cleared.items():
+            request_log.log('clearing_ready_status', player=player_name, reason=reason)
+
     def action(self):
-        self.to_server({'ready': self.ui.ready_status, 'wait_for': self.ui.wait_for.to_json(), 'depth': self.ui.depth})
-        self.client().check_game_state()
+        self.to_server_async({'ready': self.ui.ready_status, 'wait_for': self.ui.wait_for.to_json(), 'depth': self.ui.depth},
+                             lambda response: self.client().check_game_state())
@@ -0,0 +1,34 @@
+from network import connection
+from network.connection import bad_request
+from network.my_types import JSONInfo
+from stories.story import Story
+
+
+class ResumePushStream(Story):
+    """
+    Sent by a client after it reconnected: the server sends the push messages the client missed over the new websocket.
+    If they are not available anymore, the client has to request the full game state instead.
+    """
+
+    def from_client(self, json_info: JSONInfo) -> JSONInfo:
+        if self.missing_attributes(json_info, ['session_id', 'stream_id', 'last_seq']):
+            return bad_request(self.missing_attributes(json_info, ['session_id', 'stream_id', 'last_seq']))
+        ws_connection = connection.current_connection
+        if ws_connection is None:
+            return bad_request('Push messages are only available over websockets.')
+        username = self.session_user(json_info).username
+        messages = connection.push_stream.missed_messages(username, json_info['stream_id'], int(json_info['last_seq']))
+        if messages is None:
+            return {'resync': True, 'replayed': 0}
+        for message in messages:
+            connection.send(ws_connection.ws, message)
+        return {'resync': False, 'replayed': len(messages)}
+
+    def action(self):
+        server_connection = self.client().server_connection
+        self.to_server_async({'stream_id': server_connection.push_stream_id, 'last_seq': server_connection.last_push_seq},
+                             self.handle_response)
+
+    def handle_response(self, response: JSONInfo):
+        if response['resync']:
+            self.client().check_game_state()
@@ -1,9 +1,12 @@
 import threading
-from typing import Dict, List, Union
+from concurrent.futures import Future
+from typing import Dict, List, Union, Optional, Callable
 
 from data import server_gamestate
+from data.user import User
 import network.connection
 from network.my_types import JSONInfo
+from network.server_connection import host_url
 from lib.util import EBC
 
 
@@ -16,6 +19,34 @@ class Story(EBC):
         return self.ui.client
 
     def to_server(self, json_info=None) -> JSONInfo:
+        json_info = self.request_data(json_info)
+        response = self.client().server_request(host=self.client().host,
+                                                route=type(self).__name__,
+                                                data=json_info)
+        if 'messages' in response:
+            self.client().send_messages(response['messages'])
+        return response
+
+    def to_server_async(self, json_info: Optional[JSONInfo], callback: Callable[[JSONInfo], None]) -> Future:
+        """
+        Like `to_server`, but does not wait for the answer.
+        `callback` is called with the response on the main thread, errors are handled like in `__call__`.
+        """
+        json_info = self.request_data(json_info)
+
+        def on_response(future: Future):
+            with self.client().handling_errors():
+                response = future.result()
+                if 'messages' in response:
+                    self.client().send_messages(response['messages'])
+                callback(response)
+
+        return self.client().server_request_async(host=self.client().host,
+                                                  route=type(self).__name__,
+                                                  data=json_info,
+                                                  callback=on_response)
+
+    def request_data(self, json_info: Optional[JSONInfo]) -> JSONInfo:
         if json_info is None:
             json_info = {}
         json_info['route'] = type(self).__name__
@@ -25,13 +56,8 @@ class Story(EBC):
                 if self.client().local_gamestate.main_user() is not None:
                     json_info['session_id'] = self.client().local_gamestate.main_user().session_id
         if self.client().host is None:
-            self.client().host = 'http://' + self.ui.serverIPEdit.text() + ':' + str(network.connection.PORT)
-        response = self.client().server_request(host=self.client().host,
-                                                route=type(self).__name__,
-                                                data=json_info)
-        if 'messages' in response:
-            self.client().send_messages(response['messages'])
-        return response
+            self.client().host = host_url(self.ui.serverIPEdit.text(), network.connection.PORT)
+        return json_info
 
     def from_client(self, json_info: JSONInfo) -> JSONInfo:
         raise NotImplementedError
@@ -47,14 +73,27 @@ class Story(EBC):
     def action(self):
         raise NotImplementedError
 
+    @staticmethod
+    def session_user(request_json: Dict) -> Optional[User]:
+        """
+        The user that sent the request.
+        For websocket requests this is the user the connection is authenticated as,
+        for plain HTTP requests, or if that session has expired, the session_id of the request is looked up.
+        """
+        ws_connection = network.connection.current_connection
+        if ws_connection is not None and ws_connection.authenticated():
+            user = ws_connection.user()
+            if user is not None:
+                return user
+        return server_gamestate.gs.user_by_session_id(request_json.get('session_id'))
+
     @staticmethod
     def missing_attributes(request_json: Dict, attributes: List[str]):
         for attr in attributes:
-            if attr not in request_json:
-                if str(attr) == 'session_id':
-                    return 'You are not signed in.'
-                return 'Missing value for attribute ' + str(attr)
             if str(attr) == 'session_id':
-                if not server_gamestate.gs.valid_session_id(request_json['session_id']):
+                if Story.session_user(request_json) is None:
                     return 'You are not signed in.'
+                continue
+            if attr not in request_json:
+                return 'Missing value for attribute ' + str(attr)
         return False
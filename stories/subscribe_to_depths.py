@@ -0,0 +1,47 @@
+from typing import List, Optional
+
+from network.connection import bad_request
+from network.my_types import JSONInfo
+from network.state_updates import depth_subscriptions
+from stories.check_game_state import CheckGameState
+
+
+class SubscribeToDepths(CheckGameState):
+    """
+    Selects the depths of nested matches the user receives the players, ready players and results of,
+    in state updates and in the game state. `None` subscribes to all depths.
+    Of the other depths, only what is needed to find the nested matches is sent, so clients subscribe to every depth they read the details of.
+    Answers with the game state as seen with the new subscription, or the changes to the state the client has.
+    """
+
+    def __init__(self, ui, depths: Optional[List[int]] = None):
+        super().__init__(ui)
+        self.depths = depths
+
+    def from_client(self, json_info: JSONInfo) -> JSONInfo:
+        if self.missing_attributes(json_info, ['session_id', 'depths']):
+            return bad_request(self.missing_attributes(json_info, ['session_id', 'depths']))
+        username = self.session_user(json_info).username
+        if json_info['depths'] is None:
+            depth_subscriptions.pop(username, None)
+        else:
+            depth_subscriptions[username] = frozenset(int(depth) for depth in json_info['depths'])
+        return super().from_client(json_info)
+
+    def action(self):
+        if self.client().local_gamestate is None:
+            return
+        self.pending = self.to_server_async(self.state_request(), self.handle_response)
+
+    def handle_response(self, response: JSONInfo):
+        if 'error' in response:
+            print('Could not subscribe to depths:', response)
+            return
+        if response.get('not_modified'):  # subscribed to the depths the local state already has
+            self.client().server_connection.set_push_stream_position(**response['push_stream'])
+            return
+        if not self.apply_response(response):
+            self.pending = self.to_server_async(self.state_request(full=True), self.apply_response)
+
+    def state_request(self, full=False) -> JSONInfo:
+        return {**super().state_request(full), 'depths': self.depths}
@@ -7,7 +7,7 @@ from data.random_event_sampler import RandomEventSampler
 from data.replace_player import ReplacePlayerWithNewlyGeneratedPlayer
 from data.game_event_base import GameEvent
 from data.manager_choice import ManagerChoice
-from network.connection import precondition_failed
+from network.connection import precondition_failed, bad_request
 from network.my_types import JSONInfo
 from stories.story import Story
 
@@ -22,7 +22,9 @@ class TakeManagementAction(Story):
         self.action_name = action_name  # on server side, the action name is None (indicating arbitrary action can be performed using the object)
 
     def from_client(self, json_info: JSONInfo) -> JSONInfo:
-        user = server_gamestate.gs.user_by_session_id(json_info['session_id'])
+        if self.missing_attributes(json_info, ['session_id']):
+            return bad_request(self.missing_attributes(json_info, ['session_id']))
+        user = self.session_user(json_info)
         action_name: str = json_info['action_name']
         depth: int = json_info["depth"]
         game = server_gamestate.gs.game_at_depth(depth)
@@ -32,7 +34,7 @@ class TakeManagementAction(Story):
             return precondition_failed('The match has already started. You can do that after the match.')
         if player.pending_choices:
             # pretend that the player did not know about that event yet and send it again
-            return {'new_events': [e.to_json() for e in player.pending_choices], 'player_name': player.name}
+            return {'new_events': [e.to_json() for e in player.pending_choices], 'player_name': player.name, 'already_pending': True}
         if player.days_until_next_match <= 0:
             return precondition_failed('You don\'t have enough time to take this action before the next tournament match. Better get ready.')
 
@@ -63,10 +65,25 @@ class TakeManagementAction(Story):
         return {t.__name__: t for t in types}
 
     def action(self):
-        response = self.to_server({'action_name': self.action_name, 'depth': self.ui.depth})
-        new_events = response['new_events']
-        self.client().check_game_state()
-        for event_data in new_events:
-            e = GameEvent.from_json(event_data)
+        self.to_server_async({'action_name': self.action_name, 'depth': self.ui.depth}, self.handle_response)
+
+    def handle_response(self, response: JSONInfo):
+        new_events = [GameEvent.from_json(event_data) for event_data in response['new_events']]
+        if not response.get('already_pending') and all(e.deterministic() for e in new_events):
+            # show the result right away, the next state update from the server reconciles it.
+            # events that sample something, like a player replacement, would turn out differently than on the server
+            if self.client().local_gamestate.apply_optimistically(response.get('state_version'), self.ui.depth,
+                                                                  lambda game, player: self.apply_locally(game, player, new_events)):
+                self.client().after_state_update()
+        for e in new_events:
             assert isinstance(e, GameEvent)
             self.ui.handle_game_event(e)
+
+    @staticmethod
+    def apply_locally(game, player, new_events: typing.List[GameEvent]):
+        """What `from_client` did on the server, with the events it sampled"""
+        if player.name in game.ready_players:
+            del game.ready_players[player.name]
+        player.days_until_next_match -= 1
+        for e in new_events:
+            e.apply(game, player)
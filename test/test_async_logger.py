@@ -0,0 +1,28 @@
+import contextlib
+import io
+import logging
+import unittest
+
+from lib.async_logger import AsyncLogger
+
+
+class TestAsyncLogger(unittest.TestCase):
+    def test_records_are_written_in_the_background(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            logger = AsyncLogger()
+            logger.log('request', route='checkgamestate', t=0.12345, status=200)
+            logger.close()
+        self.assertIn('request route=checkgamestate t=0.1235 status=200', output.getvalue())
+
+    def test_sampling(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            logger = AsyncLogger(sample_rates={'websocket_message': 0.})
+            for _ in range(10):
+                logger.log('websocket_message', status=200)
+            logger.log('websocket_message', level=logging.ERROR, status=500)
+            logger.close()
+        self.assertNotIn('status=200', output.getvalue())
+        self.assertIn('ERROR websocket_message status=500', output.getvalue())
+
@@ -0,0 +1,23 @@
+import unittest
+
+from data.app_gamestate import AppGameState
+from data.esports_player import ESportsPlayer
+from data.game_view_model import StateViewModel, RANK_HISTORY_LENGTH
+
+
+class TestGameViewModel(unittest.TestCase):
+    def test_matches_the_values_computed_from_the_game(self):
+        gs = AppGameState.create(game_name='test')
+        for _ in range(RANK_HISTORY_LENGTH + 1):
+            gs.game.start_match()
+            gs.game.skip_to_end_of_ongoing_match()
+        view = StateViewModel(gs, revision=0)
+        game_view = view.game_at_depth(0)
+        self.assertIs(view.game_at_depth(0), game_view)
+        self.assertIsNone(view.game_at_depth(1))
+        self.assertEqual(game_view.leaderboard, sorted(gs.game.players.values(), key=ESportsPlayer.rank_sorting_key))
+        for name, player in gs.game.players.items():
+            self.assertEqual(game_view.tags_and_names[name], player.tag_and_name())
+            self.assertEqual(game_view.recent_ranks_string(name), gs.game.previous_ranks_string(n=RANK_HISTORY_LENGTH, player_name=name))
+        self.assertEqual(len(game_view.league_table_rows), len(gs.game.players))
+        self.assertEqual(game_view.league_table_rows[0][1], game_view.leaderboard[0].tag_and_name())
@@ -0,0 +1,66 @@
+import unittest
+
+from data.app_gamestate import AppGameState
+from data.app_local_game_state import AppLocalGameState
+from data.app_user import AppUser
+from frontend.headless_client import HeadlessClient
+from network.state_updates import GAME_STATE_UPDATE
+from stories.check_game_state import CheckGameState
+
+
+class TestHeadlessClient(unittest.TestCase):
+    def test_push_messages_update_the_local_state(self):
+        client = HeadlessClient('http://127.0.0.1:1')
+        gs = AppGameState(game_name='test')
+        gs.new_user(AppUser(username='user1'), initialize=False)
+        client.local_gamestate = AppLocalGameState(gs, main_user_name='user1')
+        client.local_gamestate.apply_full_state({'version': 1, 'users': [{'username': 'user1'}]})
+
+        client.handle_push_message(GAME_STATE_UPDATE, {'base_version': 1, 'version': 2, 'diff': [{'op': 'set', 'path': ['users', 1], 'value': {'username': 'user2'}}]})
+        self.assertEqual(client.local_gamestate.version(), 2)
+        self.assertIsNotNone(client.state().user_by_name('user2'))
+        self.assertFalse(client.stale)
+        client.handle_push_message(GAME_STATE_UPDATE, {'base_version': 1, 'version': 2, 'diff': []})  # already applied
+        self.assertFalse(client.stale)
+        client.handle_push_message(GAME_STATE_UPDATE, {'base_version': 3, 'version': 4, 'diff': []})  # missed one
+        self.assertTrue(client.stale)
+        self.assertEqual(client.local_gamestate.version(), 2)
+
+        client.stale = False
+        state_json = client.local_gamestate.state_json
+        client.handle_push_message(GAME_STATE_UPDATE, {'base_version': 2, 'version': 3, 'diff': [
+            {'op': 'set', 'path': ['users', 0, 'username'], 'value': 'renamed'},
+            {'op': 'set', 'path': ['users', 5], 'value': {'username': 'user6'}},
+        ]})  # does not fit
+        self.assertTrue(client.stale)
+        self.assertIs(client.local_gamestate.state_json, state_json)
+        self.assertEqual(state_json['users'][0]['username'], 'user1')
+        self.assertEqual(client.local_gamestate.version(), 2)
+
+    def test_outdated_answers_are_ignored(self):
+        client = HeadlessClient('http://127.0.0.1:1')
+        gs = AppGameState(game_name='test')
+        gs.new_user(AppUser(username='user1'), initialize=False)
+        client.local_gamestate = AppLocalGameState(gs, main_user_name='user1')
+        client.local_gamestate.apply_full_state({'version': 3, 'epoch': 'e1', 'users': [{'username': 'user1'}, {'username': 'user2'}]})
+
+        # answers to requests sent before push messages brought the state to version 3
+        story = CheckGameState(client.ui)
+        push_stream = {'stream_id': 'stream1', 'seq': 5}
+        self.assertTrue(story.apply_response({'game_state': {'version': 2, 'epoch': 'e1', 'users': [{'username': 'user1'}]}, 'push_stream': push_stream}))
+        self.assertTrue(story.apply_response({'state_diff': {'base_version': 2, 'version': 3, 'diff': [{'op': 'del', 'path': ['users', 1]}]}, 'push_stream': push_stream}))
+        self.assertEqual(client.local_gamestate.version(), 3)
+        self.assertIsNotNone(client.state().user_by_name('user2'))
+        # the push messages that brought the state further are newer than the stream position of the answers
+        self.assertIsNone(client.server_connection.push_stream_id)
+        self.assertIsNone(client.server_connection.last_push_seq)
+
+        push_stream = {'stream_id': 'stream1', 'seq': 7}
+        self.assertTrue(story.apply_response({'state_diff': {'base_version': 3, 'version': 4, 'diff': [{'op': 'del', 'path': ['users', 1]}]}, 'push_stream': push_stream}))
+        self.assertEqual(client.local_gamestate.version(), 4)
+        self.assertEqual(client.local_gamestate.state_json['users'], [{'username': 'user1'}])
+        self.assertEqual(client.server_connection.push_stream_id, 'stream1')
+        self.assertEqual(client.server_connection.last_push_seq, 7)
+
+        # the versions of a new epoch can not be compared to the ones of the old epoch
+        self.assertFalse(story.outdated({'game_state': {'version': 1, 'epoch': 'e2', 'users': []}}))
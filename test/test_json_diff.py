@@ -0,0 +1,74 @@
+import copy
+import json
+import unittest
+
+from lib.json_diff import json_diff, apply_json_diff, compact_json_diff, apply_json_diff_to_copy
+
+
+class TestJSONDiff(unittest.TestCase):
+    def assert_diff_reproduces(self, old, new):
+        ops = json_diff(old, new)
+        json.dumps(ops)
+        result = apply_json_diff(copy.deepcopy(old), ops)
+        self.assertEqual(result, new)
+        return ops
+
+    def test_equal_documents(self):
+        self.assertEqual(self.assert_diff_reproduces({'a': [1, {'b': None}]}, {'a': [1, {'b': None}]}), [])
+
+    def test_nested_changes(self):
+        old = {'game': {'players': {'p1': {'money': 10, 'controller': None}}, 'ongoing_match': None}, 'users': [{'username': 'u1'}]}
+        new = {'game': {'players': {'p1': {'money': 12, 'controller': 'u2'}}, 'ongoing_match': {'players': {}}}, 'users': [{'username': 'u1'}, {'username': 'u2'}]}
+        ops = self.assert_diff_reproduces(old, new)
+        self.assertIn({'op': 'set', 'path': ['game', 'players', 'p1', 'money'], 'value': 12}, ops)
+        self.assertIn({'op': 'set', 'path': ['users', 1], 'value': {'username': 'u2'}}, ops)
+
+    def test_deletions_and_shrinking_lists(self):
+        self.assert_diff_reproduces({'a': 1, 'b': [1, 2, 3]}, {'b': [1]})
+        self.assert_diff_reproduces({'a': {'b': 1}}, {'a': [1]})
+
+    def test_types_are_preserved(self):
+        self.assertEqual(len(json_diff({'a': 1}, {'a': 1.})), 1)
+        self.assertEqual(len(json_diff({'a': 1}, {'a': True})), 1)
+
+    def test_replacing_the_root(self):
+        self.assert_diff_reproduces([1, 2], {'a': 1})
+
+    def test_compacting_concatenated_diffs(self):
+        states = [
+            {'a': {'b': 1}, 'c': [1]},
+            {'a': {'b': 2, 'd': 1}, 'c': [1, 2]},
+            {'a': {'b': 3}, 'c': [1, 2, 3]},
+            {'a': {'b': 3, 'd': 2}, 'c': [4]},
+            {'c': [4]},
+        ]
+        ops = []
+        for old, new in zip(states, states[1:]):
+            ops.extend(json_diff(old, new))
+        compacted = compact_json_diff(ops)
+        self.assertLess(len(compacted), len(ops))
+        self.assertEqual(apply_json_diff(copy.deepcopy(states[0]), compacted), states[-1])
+        self.assertEqual(compact_json_diff(json_diff(states[0], states[1])), json_diff(states[0], states[1]))
+
+    def test_compacting_keeps_list_appends(self):
+        states = [{'c': [0]}, {'c': [0, 1]}, {'c': [0, 1, 2]}, {'c': [0, 5, 2]}, {'c': [0, 5, 2, {'d': 1}]}, {'c': [0, 5, 2, {'d': 2}]}]
+        ops = []
+        for old, new in zip(states, states[1:]):
+            ops.extend(json_diff(old, new))
+        compacted = compact_json_diff(ops)
+        self.assertEqual(apply_json_diff(copy.deepcopy(states[0]), compacted), states[-1])
+        self.assertNotIn({'op': 'set', 'path': ['c', 3, 'd'], 'value': 1}, compacted)
+
+    def test_applying_to_a_copy(self):
+        old = {'a': {'b': [1, 2]}, 'c': {'d': 1}}
+        new = {'a': {'b': [1, 3, 4]}, 'c': {'d': 1}, 'e': 5}
+        original = copy.deepcopy(old)
+        result = apply_json_diff_to_copy(old, json_diff(old, new))
+        self.assertEqual(result, new)
+        self.assertEqual(old, original)
+        self.assertIs(result['c'], old['c'])  # unchanged parts are shared
+
+        ops = [{'op': 'set', 'path': ['a', 'x'], 'value': 1}, {'op': 'set', 'path': ['a', 'b', 5], 'value': 1}]
+        with self.assertRaises(IndexError):
+            apply_json_diff_to_copy(old, ops)
+        self.assertEqual(old, original)
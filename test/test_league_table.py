@@ -0,0 +1,12 @@
+import unittest
+
+from data.league_table import changed_row_ranges
+
+
+class TestLeagueTable(unittest.TestCase):
+    def test_changed_row_ranges(self):
+        old = [('#1', 'a'), ('#2', 'b'), ('#3', 'c'), ('#4', 'd'), ('#5', 'e')]
+        new = [('#1', 'a'), ('#2', 'c'), ('#3', 'b'), ('#4', 'd'), ('#5', 'f'), ('#6', 'g')]
+        self.assertEqual(changed_row_ranges(old, new), [(1, 2), (4, 4)])
+        self.assertEqual(changed_row_ranges(new, new), [])
+        self.assertEqual(changed_row_ranges(old, new[:2]), [(1, 1)])
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy
+
+from data.action_event_sampler import PlayRankedMatchesSampler, PlayUnrankedMatchesSampler, PlayBotMatchesSampler
+from data.custom_trueskill import CustomTrueSkill
+from data.esports_player import ESportsPlayer
+from data.game_event import ComposedEvent
+from data.opponent_pool import OpponentPool, PUBLIC_PLAYER_HANDICAP
+
+
+class TestOpponentPool(unittest.TestCase):
+    def test_same_skills_as_created_players(self):
+        pool = OpponentPool.create(100)
+        self.assertEqual(pool.shape, (100, 64))
+        players = [ESportsPlayer.create() for _ in range(2000)]
+        created_skills = numpy.array([p.hidden_skill() for p in players])
+        self.assertLess(abs(pool.hidden_skills().mean() - created_skills.mean()), 10)
+        self.assertLess(abs(pool.hidden_skills().std() - created_skills.std()), 10)
+
+    def test_public_players_are_paired_by_rating(self):
+        pool = OpponentPool.create(200)
+        skills = pool.hidden_skills()
+        strong_opponents = pool.public_players(2500).hidden_skills()
+        self.assertAlmostEqual(strong_opponents.mean(), skills.mean() - PUBLIC_PLAYER_HANDICAP, delta=10)
+        weak_opponents = pool.public_players(1000).hidden_skills()
+        self.assertLess(weak_opponents.mean(), 1200 + 30)
+
+        # one rating per match
+        opponents = pool.match(0).public_players(1000)
+        self.assertEqual(opponents.shape, (1, 64))
+        opponents = OpponentPool.create(2).public_players(numpy.array([1000, 2500]))
+        self.assertLess(opponents.hidden_skills()[0].mean(), opponents.hidden_skills()[1].mean())
+
+    def test_sample_ranks(self):
+        ts = CustomTrueSkill()
+        pool = OpponentPool.create(50, 10).bots(1500)
+        ranks = pool.sample_ranks(ts, player_skill=5000)
+        self.assertEqual(ranks.shape, (50, 11))
+        for match_ranks in ranks:
+            self.assertEqual(sorted(match_ranks.tolist()), list(range(11)))
+        self.assertEqual(ranks[:, 0].tolist(), [0] * 50)
+
+    def test_samplers(self):
+        player = ESportsPlayer.create()
+        rating_before = player.ranked_elo
+        events = PlayRankedMatchesSampler().possible_events(None, player)
+        self.assertIsInstance(events[0], ComposedEvent)
+        self.assertNotEqual(player.ranked_elo, rating_before)
+        self.assertLess(player.ranked_elo_sigma, ESportsPlayer.starting_sigma())
+
+        events = PlayUnrankedMatchesSampler().possible_events(None, player)
+        self.assertIn('average placement', events[0].description)
+
+        rating_before = player.bot_match_elo
+        PlayBotMatchesSampler().possible_events(None, player)
+        self.assertNotEqual(player.bot_match_elo, rating_before)
@@ -0,0 +1,182 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+import gevent
+import gevent.pool
+
+from data import server_gamestate
+from data.app_gamestate import AppGameState
+from data.app_user import AppUser
+from lib.json_diff import apply_json_diff
+from network import connection
+from network.state_updates import GAME_STATE_UPDATE
+from stories.story import Story
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.):
+        self.delay = delay
+        self.closed = False
+        self.sent = []
+        self.handler = SimpleNamespace(client_address=('127.0.0.1', 0))
+
+    def send(self, message):
+        gevent.sleep(self.delay)
+        self.sent.append(message)
+
+    def close(self):
+        self.closed = True
+
+
+class TestPushMessage(unittest.TestCase):
+    def setUp(self):
+        self.sockets = {'fast1': FakeWebSocket(), 'slow': FakeWebSocket(delay=10), 'fast2': FakeWebSocket()}
+        for username, ws in self.sockets.items():
+            connection.websockets.add_user(ws, username)
+
+    def tearDown(self):
+        for ws in self.sockets.values():
+            connection.websockets.unregister(ws)
+
+    def test_slow_socket_does_not_stall_the_others(self):
+        original_timeout = connection.SEND_TIMEOUT_SECONDS
+        connection.SEND_TIMEOUT_SECONDS = 0.1
+        try:
+            connection.push_message(list(self.sockets), {'version': 1}, 'game_state_update')
+            connection.push_pool.join(timeout=5)
+        finally:
+            connection.SEND_TIMEOUT_SECONDS = original_timeout
+        self.assertEqual(len(self.sockets['fast1'].sent), 1)
+        self.assertIs(self.sockets['fast1'].sent[0], self.sockets['fast2'].sent[0])  # encoded only once
+        self.assertEqual(self.sockets['slow'].sent, [])
+        self.assertTrue(self.sockets['slow'].closed)
+        self.assertNotIn(self.sockets['slow'], connection.websockets)
+        self.assertEqual(connection.websockets.sockets_of_user('slow'), set())
+
+    def test_full_push_pool_does_not_block(self):
+        original_pool = connection.push_pool
+        connection.push_pool = gevent.pool.Pool(1)
+        try:
+            start = time.perf_counter()
+            connection.send(self.sockets['slow'], 'to slow')
+            connection.send(self.sockets['fast1'], 'to fast1')
+            connection.send(self.sockets['fast2'], 'to fast2')
+            self.assertLess(time.perf_counter() - start, 1)
+            self.assertEqual(len(connection.sockets_waiting_for_push_pool), 2)
+            self.sockets['slow'].delay = 0
+            connection.push_pool.join(timeout=15)
+        finally:
+            connection.push_pool = original_pool
+        self.assertEqual(self.sockets['fast1'].sent, ['to fast1'])
+        self.assertEqual(self.sockets['fast2'].sent, ['to fast2'])
+        self.assertEqual(len(connection.sockets_waiting_for_push_pool), 0)
+
+    def test_idle_sockets_are_closed(self):
+        for username, ws in self.sockets.items():
+            connection.websockets.touch(ws)
+        connection.websockets.state(self.sockets['slow']).last_activity -= connection.MAX_IDLE_SECONDS + 1
+        self.assertEqual(connection.close_idle_sockets(), 1)
+        self.assertTrue(self.sockets['slow'].closed)
+        self.assertNotIn(self.sockets['slow'], connection.websockets)
+        self.assertIn(self.sockets['fast1'], connection.websockets)
+
+    def test_messages_to_one_socket_keep_their_order(self):
+        for idx in range(10):
+            connection.send(self.sockets['fast1'], str(idx))
+        connection.push_pool.join(timeout=5)
+        self.assertEqual(self.sockets['fast1'].sent, [str(idx) for idx in range(10)])
+
+
+class TestWebSocketRegistry(unittest.TestCase):
+    def test_indexes(self):
+        now = [0]
+        registry = connection.WebSocketRegistry(timer=lambda: now[0])
+        ws1, ws2 = FakeWebSocket(), FakeWebSocket()
+        registry.add_user(ws1, 'u1')
+        registry.add_user(ws2, 'u1')
+        registry.add_user(ws2, 'u2')
+        self.assertEqual(registry.sockets_of_users(['u1', 'u2']), {ws1, ws2})
+        now[0] = 10
+        registry.touch(ws2)
+        self.assertEqual(registry.idle_sockets(5), [ws1])
+        state = registry.unregister(ws2)
+        self.assertFalse(state.alive)
+        self.assertEqual(registry.sockets_of_user('u1'), {ws1})
+        self.assertNotIn('u2', registry.sockets_for_user)
+        self.assertIsNone(registry.unregister(ws2))
+        registry.remove_user(ws1, 'u1')
+        self.assertEqual(registry.sockets_of_user('u1'), set())
+        self.assertIn(ws1, registry)
+
+
+class TestWebSocketConnection(unittest.TestCase):
+    def setUp(self):
+        self.original_gs = server_gamestate.gs
+        server_gamestate.gs = AppGameState(game_name='test')
+        for username in ['a', 'b']:
+            server_gamestate.gs.new_user(AppUser(username=username, session_id=f'session_{username}'), initialize=False)
+        self.ws = FakeWebSocket()
+        self.ws_connection = connection.WebSocketConnection(self.ws)
+        connection.current_connection = self.ws_connection
+
+    def tearDown(self):
+        connection.current_connection = None
+        connection.websockets.unregister(self.ws)
+        server_gamestate.gs = self.original_gs
+
+    def request_user(self, session_id):
+        self.ws_connection.authenticate_request(session_id)
+        user = Story.session_user({'session_id': session_id})
+        return None if user is None else user.username
+
+    def test_request_session_rebinds(self):
+        self.assertEqual(self.request_user('session_a'), 'a')
+        self.assertEqual(self.request_user('session_b'), 'b')
+        self.assertEqual(connection.websockets.sockets_of_user('a'), set())
+        self.assertEqual(connection.websockets.sockets_of_user('b'), {self.ws})
+        self.assertIsNone(self.request_user('unknown'))
+        self.assertEqual(connection.websockets.sockets_of_user('b'), set())
+
+    def test_rotated_session(self):
+        self.assertEqual(self.request_user('session_a'), 'a')
+        gs = server_gamestate.gs
+        gs.set_session_id(gs.user_by_session_id('session_a'), 'session_a2')
+        self.assertEqual(self.request_user('session_a2'), 'a')
+        self.assertEqual(self.ws_connection.session_id, 'session_a2')
+
+
+class TestCoalescingPushMessages(unittest.TestCase):
+    @staticmethod
+    def update(base_version, key, value):
+        return {'base_version': base_version, 'version': base_version + 1, 'diff': [{'op': 'set', 'path': [key], 'value': value}]}
+
+    def test_state_updates_are_merged_per_recipient(self):
+        queue = [(['u1', 'u2'], self.update(0, 'a', 1), GAME_STATE_UPDATE),
+                 (['u1', 'u2'], self.update(1, 'a', 2), GAME_STATE_UPDATE),
+                 (['u1'], self.update(2, 'b', 1), GAME_STATE_UPDATE)]
+        result = connection.preprocess_push_message_queue(queue)
+        self.assertEqual(len(result), 2)
+        contents_for_user = {user_id: contents for user_ids, contents, _ in result for user_id in user_ids}
+        self.assertEqual(contents_for_user['u2'], {'base_version': 0, 'version': 2, 'diff': [{'op': 'set', 'path': ['a'], 'value': 2}]})
+        self.assertEqual(contents_for_user['u1']['base_version'], 0)
+        self.assertEqual(contents_for_user['u1']['version'], 3)
+        self.assertEqual(apply_json_diff({}, contents_for_user['u1']['diff']), {'a': 2, 'b': 1})
+
+    def test_gaps_in_versions_are_not_merged(self):
+        queue = [(['u1'], self.update(0, 'a', 1), GAME_STATE_UPDATE),
+                 (['u1'], self.update(5, 'a', 2), GAME_STATE_UPDATE)]
+        self.assertEqual(connection.preprocess_push_message_queue(queue), queue)
+
+
+class TestPushStream(unittest.TestCase):
+    def test_resuming(self):
+        stream = connection.PushStream(buffer_size=3)
+        for idx in range(5):
+            seq = stream.next_seq()
+            stream.record(['u1'] if idx % 2 == 0 else ['u1', 'u2'], seq, f'message{seq}')
+        self.assertEqual(stream.missed_messages('u1', stream.stream_id, 3), ['message4', 'message5'])
+        self.assertEqual(stream.missed_messages('u2', stream.stream_id, 1), ['message2', 'message4'])
+        self.assertEqual(stream.missed_messages('u2', stream.stream_id, 5), [])
+        self.assertIsNone(stream.missed_messages('u1', stream.stream_id, 1))  # message2 was evicted
+        self.assertIsNone(stream.missed_messages('u1', 'restarted server', 3))
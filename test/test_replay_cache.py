@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from data import server_gamestate
+from data.app_gamestate import AppGameState
+from network import connection
+from network.connection import ReplayCache
+from network.routes import valid_post_routes
+from network.state_updates import state_update_tracker
+from run_server import _process_once
+from stories.story import Story
+
+
+class CountingStory(Story):
+    calls = 0
+
+    def from_client(self, json_info):
+        CountingStory.calls += 1
+        return {'calls': CountingStory.calls}
+
+
+class TestReplayCache(unittest.TestCase):
+    def test_replaying_a_request_token(self):
+        cache = ReplayCache()
+        self.assertIsNone(cache.get('user1', 'TakeManagementAction', 'token1'))
+        cache.put('user1', 'TakeManagementAction', 'token1', {'new_events': []})
+        self.assertEqual(cache.get('user1', 'TakeManagementAction', 'token1'), {'new_events': []})
+        self.assertIsNone(cache.get('user2', 'TakeManagementAction', 'token1'))
+        self.assertIsNone(cache.get('user1', 'ChooseEventAction', 'token1'))
+
+    def test_responses_expire(self):
+        now = [0]
+        cache = ReplayCache(ttl=10, timer=lambda: now[0])
+        cache.put('user1', 'TakeManagementAction', 'token1', {'new_events': []})
+        now[0] = 5
+        self.assertIsNotNone(cache.get('user1', 'TakeManagementAction', 'token1'))
+        now[0] = 11
+        self.assertIsNone(cache.get('user1', 'TakeManagementAction', 'token1'))
+
+    def test_size_is_bounded(self):
+        cache = ReplayCache(maxsize=3)
+        for idx in range(10):
+            cache.put('user1', 'TakeManagementAction', f'token{idx}', {'idx': idx})
+        self.assertEqual(len(cache.responses), 3)
+        self.assertIsNotNone(cache.get('user1', 'TakeManagementAction', 'token9'))
+
+
+class TestProcessOnce(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.original_gs = server_gamestate.gs
+        server_gamestate.gs = AppGameState(game_name=os.path.join(self.directory.name, 'test'))
+        state_update_tracker.reset(server_gamestate.gs)
+        valid_post_routes['countingstory'] = CountingStory
+        CountingStory.calls = 0
+
+    def tearDown(self):
+        del valid_post_routes['countingstory']
+        connection.replay_cache.responses.clear()
+        server_gamestate.gs = self.original_gs
+        self.directory.cleanup()
+
+    def test_retried_requests_run_once(self):
+        # the HTTP endpoint and the websocket both go through _process_once
+        self.assertEqual(_process_once('CountingStory', {}, 'token1', 'user1'), {'calls': 1, 'state_version': 0})
+        self.assertEqual(_process_once('CountingStory', {}, 'token1', 'user1'), {'calls': 1, 'state_version': 0})
+        self.assertEqual(CountingStory.calls, 1)
+        self.assertEqual(_process_once('CountingStory', {}, 'token2', 'user1')['calls'], 2)
+        self.assertEqual(_process_once('CountingStory', {}, 'token1', 'user2')['calls'], 3)
+        # without a token, every request runs
+        self.assertEqual(_process_once('CountingStory', {}, None, 'user1')['calls'], 4)
+        self.assertEqual(_process_once('CountingStory', {}, None, 'user1')['calls'], 5)
@@ -0,0 +1,38 @@
+import unittest
+from concurrent.futures import CancelledError
+
+from network.response_router import ResponseRouter
+
+
+class TestResponseRouter(unittest.TestCase):
+    def setUp(self):
+        self.now = [0]
+        self.router = ResponseRouter(timeout=10, max_orphaned_responses=2, timer=lambda: self.now[0])
+
+    def test_answers_and_round_trip_times(self):
+        future = self.router.register('token1', 'CheckGameState')
+        self.now[0] = 0.5
+        self.assertTrue(self.router.resolve({'request_token': 'token1', 'body': {}}))
+        self.assertEqual(future.result(timeout=0), {'request_token': 'token1', 'body': {}})
+        statistics = self.router.statistics()['routes']['CheckGameState']
+        self.assertEqual(statistics['requests'], 1)
+        self.assertEqual(statistics['rtt_max'], 0.5)
+
+    def test_deadlines_and_cancellation(self):
+        slow = self.router.register('token1', 'TakeManagementAction')
+        cancelled = self.router.register('token2', 'TakeManagementAction', timeout=100)
+        self.assertTrue(self.router.cancel('token2'))
+        self.now[0] = 10
+        self.router.expire()
+        self.assertIsInstance(slow.exception(timeout=0), TimeoutError)
+        self.assertRaises(CancelledError, cancelled.result, timeout=0)
+        statistics = self.router.statistics()['routes']['TakeManagementAction']
+        self.assertEqual((statistics['timeouts'], statistics['cancelled']), (1, 1))
+        self.assertEqual(self.router.statistics()['pending'], 0)
+
+    def test_orphaned_answers_are_bounded(self):
+        for idx in range(5):
+            self.assertFalse(self.router.resolve({'request_token': f'token{idx}'}))
+        self.assertEqual(self.router.statistics()['orphaned_responses'], 2)
+        # a request sent again with the same token gets the answer that arrived late
+        self.assertEqual(self.router.register('token4', 'ChooseEventAction').result(timeout=0), {'request_token': 'token4'})
@@ -1,7 +1,18 @@
 import unittest
 
+from data.app_gamestate import AppGameState
+from data.app_local_game_state import AppLocalGameState
+from data.app_user import AppUser
+from data.esports_game import ESportsGame
+from data.esports_player import ESportsPlayer
+from data.game_event import MoneyChange, ComposedEvent
 from data.game_state import GameState
+from data.manager_choice import ManagerChoice
+from data.replace_player import ReplacePlayerWithNewlyGeneratedPlayer
 from data.user import User
+from frontend.headless_client import HeadlessClient, HeadlessUi
+from stories.choose_event import ChooseEventAction
+from stories.take_action import TakeManagementAction
 
 
 class TestGameState(unittest.TestCase):
@@ -17,3 +28,93 @@ class TestGameState(unittest.TestCase):
         user = User(username='user1')
         state_1.users.append(user)
         assert user not in state_2.users
+
+    def test_user_indexes(self):
+        state = GameState(game_name='test', users=[User(username='user1', session_id='s1')])
+        self.assertIs(state.user_by_name('user1'), state.users[0])
+        self.assertIs(state.user_by_session_id('s1'), state.users[0])
+        self.assertTrue(state.valid_session_id('s1'))
+        self.assertFalse(state.valid_session_id(None))
+
+        user2 = User(username='user2', session_id='s2')
+        state.new_user(user2, initialize=False)
+        self.assertTrue(state.user_name_exists('user2'))
+        self.assertIs(state.user_by_session_id('s2'), user2)
+
+        state.set_session_id(user2, 's3')
+        self.assertFalse(state.valid_session_id('s2'))
+        self.assertIs(state.user_by_session_id('s3'), user2)
+
+        state.update_from_json({'users': [{'type': 'AppUser', 'username': 'user1', 'session_id': 's4'},
+                                          {'type': 'AppUser', 'username': 'user5'}]})
+        self.assertFalse(state.valid_session_id('s1'))
+        self.assertEqual(state.username_by_session_id('s4'), 'user1')
+        self.assertTrue(state.user_name_exists('user5'))
+
+        state.remove_user('user2')
+        self.assertFalse(state.user_name_exists('user2'))
+        self.assertFalse(state.valid_session_id('s3'))
+
+    def test_user_indexes_after_loading_from_json(self):
+        state = GameState(game_name='test', users=[User(username='user1', session_id='s1')])
+        loaded = GameState.from_json(state.to_json())
+        self.assertEqual(loaded.user_by_name('user1').session_id, 's1')
+        self.assertIs(loaded.user_by_session_id('s1'), loaded.users[0])
+
+
+class TestAppLocalGameState(unittest.TestCase):
+    def test_optimistic_changes_are_replaced_by_the_next_state(self):
+        server_state = AppGameState.create(game_name='test')
+        server_state.new_user(AppUser(username='user1'), initialize=True)
+        server_state.version = 1
+        local_game_state = AppGameState(game_name='test')
+        local_game_state.new_user(AppUser(username='user1'), initialize=False)
+        local_state = AppLocalGameState(local_game_state, main_user_name='user1')
+        local_state.apply_full_state(server_state.info_for_user('user1'))
+        money = local_state.game_state.game.player_controlled_by('user1').money
+
+        self.assertTrue(local_state.apply_optimistically(2, 0, lambda game, player: MoneyChange(money_change=10).apply(game, player)))
+        self.assertEqual(local_state.game_state.game.player_controlled_by('user1').money, money + 10)
+        self.assertFalse(local_state.apply_optimistically(1, 0, lambda game, player: MoneyChange(money_change=10).apply(game, player)))
+
+        self.assertTrue(local_state.apply_state_diff(base_version=1, version=2, diff=[]))
+        self.assertEqual(local_state.game_state.game.player_controlled_by('user1').money, money)
+
+        self.assertTrue(local_state.apply_state_diff(base_version=2, version=3, diff=[
+            {'op': 'set', 'path': ['game', 'ready_players'], 'value': {}}
+        ]))
+        self.assertEqual(local_state.depth_revision(0), 4)
+        self.assertEqual(local_state.depth_revision(1), 1)  # the full state
+
+    def test_optimistic_choice_removes_only_the_first_match(self):
+        player = ESportsPlayer.create()
+        option = MoneyChange(money_change=10)
+        player.pending_choices = [ManagerChoice(title='same', description='first', choices=[option]),
+                                  ManagerChoice(title='same', description='second', choices=[option])]
+        game = ESportsGame(players={player.name: player})
+        money = player.money
+        ChooseEventAction(None, choice_title='same', choice=option).apply_locally(game, player, [option])
+        self.assertEqual([c.description for c in player.pending_choices], ['second'])
+        self.assertEqual(player.money, money + 10)
+
+    def test_only_deterministic_events_are_applied_optimistically(self):
+        server_state = AppGameState.create(game_name='test')
+        server_state.new_user(AppUser(username='user1'), initialize=True)
+        server_state.version = 1
+        client = HeadlessClient('http://127.0.0.1:1')
+        local_game_state = AppGameState(game_name='test')
+        local_game_state.new_user(AppUser(username='user1'), initialize=False)
+        client.local_gamestate = AppLocalGameState(local_game_state, main_user_name='user1')
+        client.local_gamestate.apply_full_state(server_state.info_for_user('user1'))
+        player_name = client.local_gamestate.game_state.game.player_controlled_by('user1').name
+
+        # the client would replace the player with a different random player than the server did
+        replacement = ComposedEvent(events=[MoneyChange(money_change=10), ReplacePlayerWithNewlyGeneratedPlayer()])
+        self.assertFalse(replacement.deterministic())
+        revision = client.local_gamestate.revision
+        TakeManagementAction(HeadlessUi(client), 'x').handle_response({'new_events': [replacement.to_json()], 'state_version': 2})
+        self.assertEqual(client.local_gamestate.revision, revision)
+        self.assertEqual(client.local_gamestate.game_state.game.player_controlled_by('user1').name, player_name)
+
+        TakeManagementAction(HeadlessUi(client), 'x').handle_response({'new_events': [MoneyChange(money_change=10).to_json()], 'state_version': 2})
+        self.assertEqual(client.local_gamestate.revision, revision + 1)
@@ -0,0 +1,27 @@
+import os
+import tempfile
+import unittest
+
+from frontend.state_cache import StateCache
+
+
+class TestStateCache(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = StateCache(os.path.join(directory, 'cache'))
+            self.assertIsNone(cache.load('http://localhost:8080', 'game', 'user1'))
+            state_json = {'version': 3, 'epoch': 'e1', 'users': [{'username': 'user1', 'session_id': 'secret'}], 'game': {}}
+            cache.save('http://localhost:8080', 'game', 'user1', state_json, depths=[0])
+            cached = cache.load('http://localhost:8080', 'game', 'user1')
+            self.assertEqual(cached['state_json'], {'version': 3, 'epoch': 'e1', 'users': [{'username': 'user1'}], 'game': {}})
+            self.assertEqual(cached['depths'], [0])
+            self.assertEqual(state_json['users'][0]['session_id'], 'secret')
+            self.assertIsNone(cache.load('http://localhost:8080', 'game', 'user2'))
+
+            # without an epoch, the server could not tell whether the cached version belongs to the current game
+            cache.save('http://localhost:8080', 'game', 'user1', {'version': 3, 'users': [], 'game': {}}, depths=None)
+            self.assertIsNone(cache.load('http://localhost:8080', 'game', 'user1'))
+
+            with open(cache.file_name('http://localhost:8080', 'game', 'user1'), 'w') as f:
+                f.write('{"state_json": ')
+            self.assertIsNone(cache.load('http://localhost:8080', 'game', 'user1'))
@@ -0,0 +1,94 @@
+import copy
+import unittest
+
+from data import server_gamestate
+from data.app_gamestate import AppGameState
+from data.app_user import AppUser
+from lib.json_diff import json_diff, apply_json_diff
+from network.state_updates import prune_state_json, prune_state_diff, changed_depths, StateUpdateTracker, state_update_tracker
+from stories.check_game_state import CheckGameState
+
+
+def game(players, ongoing_match=None):
+    return {'players': players, 'ready_players': {}, 'game_results': [], 'ongoing_match': ongoing_match, 'type': 'ESportsGame'}
+
+
+class TestDepthSubscriptions(unittest.TestCase):
+    def test_pruning_the_state(self):
+        state = {'users': [], 'game': game({'a': 1}, game({'b': 2}, game({'c': 3})))}
+        pruned = prune_state_json(state, frozenset([1]))
+        self.assertNotIn('players', pruned['game'])
+        self.assertEqual(pruned['game']['ongoing_match']['players'], {'b': 2})
+        self.assertNotIn('players', pruned['game']['ongoing_match']['ongoing_match'])
+        self.assertEqual(state['game']['players'], {'a': 1})
+        self.assertIs(prune_state_json(state, None), state)
+
+    def test_subscriptions_do_not_include_the_parent_games(self):
+        state = {'users': [], 'game': game({'a': 1}, game({'b': 2}, game({'c': 3})))}
+        pruned = prune_state_json(state, frozenset([2]))
+        for parent in [pruned['game'], pruned['game']['ongoing_match']]:
+            for key in ['players', 'ready_players', 'game_results']:
+                self.assertNotIn(key, parent)
+        self.assertEqual(pruned['game']['ongoing_match']['ongoing_match']['players'], {'c': 3})
+
+    def test_pruned_diffs_update_pruned_states(self):
+        states = [
+            {'users': [], 'game': game({'a': 1})},
+            {'users': [], 'game': game({'a': 2}, game({'b': 1}))},
+            {'users': ['u'], 'game': game({'a': 2}, game({'b': 2}, game({'c': 1})))},
+            {'users': ['u'], 'game': game({'a': 3}, game({'b': 3}))},
+            {'users': ['u'], 'game': game({'a': 4})},
+        ]
+        for depths in [frozenset(), frozenset([0]), frozenset([1]), frozenset([0, 2])]:
+            for old, new in zip(states, states[1:]):
+                diff = prune_state_diff(json_diff(old, new), depths)
+                result = apply_json_diff(copy.deepcopy(prune_state_json(old, depths)), diff)
+                self.assertEqual(result, prune_state_json(new, depths))
+
+
+class TestChangedDepths(unittest.TestCase):
+    def test_changed_depths(self):
+        self.assertEqual(changed_depths([{'op': 'set', 'path': ['users', 0, 'money'], 'value': 1}]), (set(), None))
+        self.assertEqual(changed_depths([{'op': 'set', 'path': ['game', 'ongoing_match', 'players', 'b'], 'value': 1},
+                                         {'op': 'del', 'path': ['game', 'ready_players', 'a']}]), ({0, 1}, None))
+        self.assertEqual(changed_depths([{'op': 'set', 'path': ['game', 'ongoing_match', 'ongoing_match'], 'value': None}]), ({1}, 2))
+        self.assertEqual(changed_depths([{'op': 'set', 'path': [], 'value': {}}]), (set(), 0))
+
+
+class TestDiffHistory(unittest.TestCase):
+    def test_diff_since(self):
+        tracker = StateUpdateTracker(history_length=3)
+        states = [{'a': idx, 'b': [0] * idx} for idx in range(5)]
+        for version, (old, new) in enumerate(zip(states, states[1:])):
+            tracker.history.append({'base_version': version, 'version': version + 1, 'diff': json_diff(old, new)})
+        self.assertIsNone(tracker.diff_since(0, 4))  # forgotten
+        self.assertEqual(apply_json_diff(copy.deepcopy(states[1]), tracker.diff_since(1, 4)), states[4])
+        self.assertEqual(tracker.diff_since(3, 4), json_diff(states[3], states[4]))
+        self.assertIsNone(tracker.diff_since(1, 5))
+
+
+class TestCheckGameState(unittest.TestCase):
+    def setUp(self):
+        self.original_gs = server_gamestate.gs
+        server_gamestate.gs = AppGameState(game_name='test', version=3)
+        server_gamestate.gs.new_user(AppUser(username='a', session_id='session_a'), initialize=False)
+        state_update_tracker.reset(server_gamestate.gs)
+
+    def tearDown(self):
+        server_gamestate.gs = self.original_gs
+
+    def check(self, known_version, known_epoch):
+        return CheckGameState(None).from_client({'session_id': 'session_a', 'known_version': known_version, 'known_epoch': known_epoch})
+
+    def test_versions_of_other_epochs_are_not_trusted(self):
+        epoch = server_gamestate.gs.epoch
+        self.assertTrue(self.check(3, epoch).get('not_modified'))
+        # for example the client cached a game with the same name that was replaced, or the save was changed offline
+        response = self.check(3, 'other_epoch')
+        self.assertNotIn('not_modified', response)
+        self.assertEqual(response['game_state']['epoch'], epoch)
+
+        state_update_tracker.history.append({'base_version': 2, 'version': 3, 'diff': []})
+        self.assertIn('state_diff', self.check(2, epoch))
+        self.assertIn('game_state', self.check(2, 'other_epoch'))
+        self.assertIn('game_state', self.check(2, None))
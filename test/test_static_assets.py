@@ -0,0 +1,53 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from network.static_assets import StaticAssetIndex
+
+
+class TestStaticAssetIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.directory.name, 'config'))
+        self.write('index.html', '<html>' + 'Esports Manager Manager ' * 100 + '</html>')
+        self.write('config/settings.json', '{}')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, relative_path, content):
+        with open(os.path.join(self.directory.name, relative_path), 'w') as f:
+            f.write(content)
+
+    def test_serving_files(self):
+        index = StaticAssetIndex(self.directory.name)
+        response = index.response('index.html')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.body.startswith(b'<html>'))
+        self.assertTrue(response.content_type.startswith('text/html'))
+        self.assertEqual(index.response('config/settings.json').body, b'{}')
+        self.assertEqual(index.response('missing.html').status_code, 404)
+
+    def test_compressed_variants(self):
+        index = StaticAssetIndex(self.directory.name)
+        plain = index.response('index.html')
+        compressed = index.response('index.html', accept_encoding='gzip, deflate')
+        self.assertEqual(compressed.get_header('Content-Encoding'), 'gzip')
+        self.assertEqual(gzip.decompress(compressed.body), plain.body)
+        self.assertNotEqual(compressed.get_header('ETag'), plain.get_header('ETag'))
+        self.assertIsNone(index.response('index.html', accept_encoding='gzip;q=0').get_header('Content-Encoding'))
+
+    def test_not_modified(self):
+        index = StaticAssetIndex(self.directory.name)
+        etag = index.response('index.html').get_header('ETag')
+        self.assertEqual(index.response('index.html', if_none_match=etag).status_code, 304)
+        self.assertEqual(index.response('index.html', if_none_match='"other"').status_code, 200)
+
+    def test_rebuilding(self):
+        index = StaticAssetIndex(self.directory.name)
+        etag = index.response('index.html').get_header('ETag')
+        self.write('index.html', '<html>changed</html>')
+        self.assertEqual(index.response('index.html', if_none_match=etag).status_code, 304)
+        index.rebuild()
+        self.assertEqual(index.response('index.html', if_none_match=etag).status_code, 200)
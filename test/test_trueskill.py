@@ -1,6 +1,8 @@
 import random
 import unittest
 
+from trueskill import TrueSkill
+
 from data.custom_trueskill import CustomTrueSkill
 
 
@@ -252,3 +254,55 @@ class TestTrueSkill(unittest.TestCase):
     def print_ratings(self, ratings):
         for i, (new_rating,) in enumerate(ratings):
             print(f"Player {i}: mu={new_rating.mu:.1f}, sigma={new_rating.sigma:.1f}")
+
+    def test_sampled_ranks(self):
+        ts = CustomTrueSkill()
+        ratings = [(ts.create_rating(mu=ts.mu + 1000),), (ts.create_rating(mu=ts.mu),), (ts.create_rating(mu=ts.mu - 1000),)]
+        self.assertEqual(ts.sample_ranks(ratings), [0, 1, 2])
+        ranks = ts.sample_ranks_of_matches([ratings[::-1]] * 10)
+        self.assertEqual(ranks.tolist(), [[2, 1, 0]] * 10)
+
+        # the performances of team members add up
+        teams = [(ts.create_rating(mu=ts.mu / 2 + 500), ts.create_rating(mu=ts.mu / 2 + 500)), (ts.create_rating(mu=ts.mu),)]
+        self.assertEqual(ts.sample_ranks(teams), [0, 1])
+        teams = [(ts.create_rating(mu=ts.mu / 2 - 500), ts.create_rating(mu=ts.mu / 2 - 500)), (ts.create_rating(mu=ts.mu),)]
+        self.assertEqual(ts.sample_ranks(teams), [1, 0])
+
+        equal_ratings = [(ts.create_rating(),) for _ in range(64)]
+        ranks = ts.sample_ranks_of_matches([equal_ratings] * 1000)
+        for match_ranks in ranks:
+            self.assertEqual(sorted(match_ranks.tolist()), list(range(64)))
+        self.assertAlmostEqual(ranks.mean(axis=0).mean(), 31.5)
+        self.assertLess(abs(ranks[:, 0].mean() - 31.5), 3)
+
+    def test_free_for_all_matches_reference(self):
+        ts = CustomTrueSkill()
+        for num_players in [2, 3, 5, 65, 300]:
+            ratings = [(ts.create_rating(mu=random.gauss(ts.mu, 300), sigma=random.uniform(20, ts.sigma)),)
+                       for _ in range(num_players)]
+            ranks = ts.sample_ranks(ratings)
+            self.assertTrue(ts.is_free_for_all(ratings, ranks, None, 0.0001))
+            new_ratings = ts.rate(ratings, ranks)
+            reference = TrueSkill.rate(ts, ratings, ranks)
+            for (new_rating,), (reference_rating,) in zip(new_ratings, reference):
+                self.assertAlmostEqual(new_rating.mu, reference_rating.mu, delta=1e-6)
+                self.assertAlmostEqual(new_rating.sigma, reference_rating.sigma, delta=1e-6)
+
+        # ties and teams are left to the factor graph
+        ratings = [(ts.create_rating(),) for _ in range(3)]
+        self.assertFalse(ts.is_free_for_all(ratings, [0, 0, 1], None, 0.0001))
+        self.assertFalse(ts.is_free_for_all([ratings[0] + ratings[1], ratings[2]], None, None, 0.0001))
+        self.assertEqual(ts.rate(ratings, [0, 0, 1]), TrueSkill.rate(ts, ratings, [0, 0, 1]))
+
+    def test_free_for_all_large_field(self):
+        ts = CustomTrueSkill()
+        ratings = [(ts.create_rating(mu=random.gauss(ts.mu, 300)),) for _ in range(3000)]
+        # random ranks contain upsets that are too unlikely for TrueSkill.rate
+        ranks = random.sample(range(len(ratings)), len(ratings))
+        new_ratings = ts.rate(ratings, ranks)
+        winner = ranks.index(0)
+        loser = ranks.index(len(ratings) - 1)
+        self.assertGreater(new_ratings[winner][0].mu, ratings[winner][0].mu)
+        self.assertLess(new_ratings[loser][0].mu, ratings[loser][0].mu)
+        for (new_rating,), (old_rating,) in zip(new_ratings, ratings):
+            self.assertTrue(0 < new_rating.sigma < old_rating.sigma)
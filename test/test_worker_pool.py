@@ -0,0 +1,132 @@
+import socket
+import unittest
+
+import gevent.queue
+
+from network.server_connection import host_url
+from network.worker_pool import Worker, WorkerPool, WorkerLimitReached, relay_to_game, WORKER_HOST
+
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = -15
+
+
+class FakeWebSocket:
+    """Both ends of the relay: `receive`/`recv` return the queued messages and block once there are none left"""
+
+    def __init__(self, messages=()):
+        self.messages = gevent.queue.Queue()
+        for msg in messages:
+            self.messages.put(msg)
+        self.sent = []
+        self.closed = False
+        self.close_code = None
+
+    def receive(self):
+        return self.messages.get()
+
+    recv = receive
+
+    def send(self, msg, opcode=None):
+        self.sent.append(msg)
+
+    def close(self, code=None, message=None):
+        self.closed = True
+        self.close_code = code
+
+
+class FakeWorker(Worker):
+    def spawn_process(self):
+        return FakeProcess()
+
+    def wait_until_listening(self):
+        pass
+
+    def connect_websocket(self):
+        # the worker answers every message, and closes the connection after the first answer
+        self.upstream = FakeWebSocket()
+        send = self.upstream.send
+
+        def answer(msg, opcode=None):
+            send(msg, opcode)
+            self.upstream.messages.put(f'{self.game_name}: {msg}')
+            self.upstream.messages.put(None)
+
+        self.upstream.send = answer
+        return self.upstream
+
+
+class FakeWorkerPool(WorkerPool):
+    def create_worker(self, game_name, port):
+        return FakeWorker(game_name, port)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = FakeWorkerPool(first_worker_port=self.free_port(), allowed_games=['game1', 'game2', 'game3'], max_workers=2)
+
+    @staticmethod
+    def free_port():
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind((WORKER_HOST, 0))
+            return s.getsockname()[1]
+
+    def test_only_known_games_are_started(self):
+        self.assertIsNone(self.pool.worker_for_game('unknown_game'))
+        self.assertEqual(self.pool.workers, {})
+        worker = self.pool.worker_for_game('game1')
+        self.assertEqual(worker.game_name, 'game1')
+        self.assertIs(self.pool.worker_for_game('game1'), worker)
+
+    def test_number_of_workers_is_limited(self):
+        self.pool.worker_for_game('game1')
+        worker2 = self.pool.worker_for_game('game2')
+        with self.assertRaises(WorkerLimitReached):
+            self.pool.worker_for_game('game3')
+
+        # a crashed worker is restarted on the same port, without counting as an additional game
+        worker2.process.returncode = 1
+        restarted = self.pool.worker_for_game('game2')
+        self.assertIsNot(restarted, worker2)
+        self.assertEqual(restarted.port, worker2.port)
+
+    def test_ports_in_use_are_skipped(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as blocker:
+            blocker.bind((WORKER_HOST, self.pool.next_port))
+            blocker.listen()
+            worker1 = self.pool.worker_for_game('game1')
+            worker2 = self.pool.worker_for_game('game2')
+            self.assertNotEqual(worker1.port, blocker.getsockname()[1])
+        self.assertNotEqual(worker1.port, worker2.port)
+
+    def test_websockets_are_relayed_to_the_worker_of_their_game(self):
+        self.pool.worker_for_game('game1')
+        ws = FakeWebSocket(['hello'])
+        relay_to_game(ws, self.pool, 'game2')
+        worker = self.pool.workers['game2']
+        self.assertEqual(worker.upstream.sent, ['hello'])
+        self.assertEqual(ws.sent, ['game2: hello'])
+        self.assertTrue(worker.upstream.closed)
+        self.assertTrue(ws.closed)
+
+    def test_websockets_for_games_that_can_not_run_are_closed(self):
+        ws = FakeWebSocket()
+        relay_to_game(ws, self.pool, 'unknown_game')
+        self.assertEqual(ws.close_code, 4404)
+
+        self.pool.worker_for_game('game1')
+        self.pool.worker_for_game('game2')
+        ws = FakeWebSocket()
+        relay_to_game(ws, self.pool, 'game3')
+        self.assertEqual(ws.close_code, 1013)
+
+    def test_clients_can_choose_a_game(self):
+        self.assertEqual(host_url('example.com', 15291), 'http://example.com:15291')
+        self.assertEqual(host_url(' example.com/game2 ', 15291), 'http://example.com:15291/game2')